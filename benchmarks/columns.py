@@ -0,0 +1,111 @@
+"""
+Benchmark: breakdown reports from tuple rows vs. TaskColumns
+
+Imports synthetic tasks, then computes per-weekday, per-task, per-tag and
+per-day totals over every task, once from the row tuples returned by
+get_tasks_by_date_range and once from get_task_columns (with and without
+NumPy). Reports the best load and report times and the peak Python memory
+of each.
+
+	python -m benchmarks.columns [--rows 1000000]
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+import columns
+from benchmarks.workload import generate_tasks
+from columns import WEEKDAYS
+from database import Database, from_epoch, parse_tags
+
+
+def tuple_breakdown(rows):
+	"""The row-at-a-time path: aggregate tuples in Python"""
+	by_weekday = [0] * 7
+	by_name, by_tag, by_day = {}, {}, {}
+	for task in rows:
+		if task[4] is None:
+			continue
+		seconds = task[5] or 0
+		day = from_epoch(task[3], task[7]).date().isoformat()
+		by_weekday[date.fromisoformat(day).weekday()] += seconds
+		by_name[task[1]] = by_name.get(task[1], 0) + seconds
+		for tag in parse_tags(task[2]):
+			by_tag[tag] = by_tag.get(tag, 0) + seconds
+		by_day[day] = by_day.get(day, 0) + seconds
+	ranked = lambda totals: sorted(((k, v) for k, v in totals.items() if v), key=lambda p: (-p[1], p[0]))
+	return (
+		list(zip(WEEKDAYS, by_weekday)), ranked(by_name), ranked(by_tag),
+		sorted((k, v) for k, v in by_day.items() if v),
+	)
+
+
+def column_breakdown(result):
+	"""The columnar path"""
+	return result.by_weekday(), result.by_name(), result.by_tag(), result.by_day()
+
+
+def run(load, report, repeat):
+	"""Return (best load seconds, best report seconds, peak traced MiB, result)"""
+	best_load = best_report = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		rows = load()
+		loaded = time.perf_counter()
+		result = report(rows)
+		done = time.perf_counter()
+		best_load = loaded - start if best_load is None else min(best_load, loaded - start)
+		best_report = done - loaded if best_report is None else min(best_report, done - loaded)
+		del rows
+	tracemalloc.start()
+	report(load())
+	peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+	tracemalloc.stop()
+	return best_load, best_report, peak, result
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--rows", type=int, default=1000000)
+	parser.add_argument("--repeat", type=int, default=3)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp, Database(str(Path(tmp) / "bench.db")) as db:
+		print(f"Importing {args.rows:,} tasks...")
+		db.import_tasks(generate_tasks(args.rows))
+		first, last = db.connection().execute(
+			"SELECT date(MIN(start_ts), 'unixepoch', 'localtime'), date(MAX(start_ts), 'unixepoch', 'localtime') FROM tasks"
+		).fetchone()
+
+		fetch_rows = lambda: db.get_tasks_by_date_range(first, last)
+		fetch_columns = lambda: db.get_task_columns(first, last)
+		paths = [
+			("tuples", fetch_rows, tuple_breakdown, True),
+			("columns, pure Python", fetch_columns, column_breakdown, False),
+		]
+		if columns.load_numpy() is not None:
+			paths.append(("columns, NumPy", fetch_columns, column_breakdown, True))
+
+		print(f"\n{first} .. {last}")
+		print(f"  {'path':<24}{'load (s)':>10}{'report (s)':>12}{'peak MiB':>10}")
+		expected = None
+		for label, load, report, numpy in paths:
+			load_numpy = columns.load_numpy
+			if not numpy:
+				columns.load_numpy = lambda: None
+			try:
+				load_s, report_s, peak, result = run(load, report, args.repeat)
+			finally:
+				columns.load_numpy = load_numpy
+			if expected is None:
+				expected = result
+			assert result == expected, f"{label} disagrees with the tuple path"
+			print(f"  {label:<24}{load_s:>10.3f}{report_s:>12.3f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,149 @@
+"""
+Stress test: many processes punching in and out of one database
+
+Each worker process starts and stops tasks in a tight loop, sometimes
+switching straight from the running task, with edits and summaries mixed
+in. Afterwards every punch a worker was told succeeded is checked against
+the database: none lost, none duplicated, at most one running task, no
+overlapping tasks and daily_totals in step. Exits with status 1 on any
+failure.
+
+	python -m benchmarks.concurrency [--workers 8] [--punches 200]
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from database import Database, TaskAlreadyRunning
+from reports import period_range
+
+
+def worker(path, number, punches, ready, go, results):
+	"""Punch ``punches`` times and report what this process saw succeed"""
+	rng = random.Random(number)
+	seen = {'started': [], 'stopped': [], 'conflicts': 0, 'errors': []}
+	with Database(path) as db:
+		ready.release()
+		go.wait()
+		for i in range(punches):
+			try:
+				task_id = db.start_task(f"Worker {number} #{i}", f"w{number}, stress", switch=rng.random() < 0.3)
+			except TaskAlreadyRunning:
+				seen['conflicts'] += 1
+				running = db.get_running_task()
+				# Stop someone else's task now and then so the others get a turn
+				if running and rng.random() < 0.5 and db.stop_task(running[0]):
+					seen['stopped'].append(running[0])
+				continue
+			except Exception as e:
+				seen['errors'].append(repr(e))
+				continue
+			seen['started'].append(task_id)
+			try:
+				if rng.random() < 0.1:
+					db.get_summary(*period_range('week'))
+				if db.stop_task(task_id):
+					seen['stopped'].append(task_id)
+				if rng.random() < 0.1:
+					task = db.get_task(task_id)
+					db.update_task(task_id, task[1], task[2] + ", edited", task[3], task[4])
+			except Exception as e:
+				seen['errors'].append(repr(e))
+	results.put(seen)
+
+
+def verify(db, results):
+	"""Return a list of problems found in the database after a run"""
+	problems = []
+	started = [task_id for seen in results for task_id in seen['started']]
+	stopped = [task_id for seen in results for task_id in seen['stopped']]
+	if len(set(started)) != len(started):
+		problems.append("a task id was returned to more than one start")
+	if len(set(stopped)) != len(stopped):
+		problems.append("a task was stopped more than once")
+
+	conn = db.connection()
+	rows = {row[0]: row for row in conn.execute("SELECT id, name, start_ts, end_ts, is_running FROM tasks")}
+	lost = set(started) - set(rows)
+	if lost:
+		problems.append(f"{len(lost)} started tasks are missing")
+	extra = set(rows) - set(started)
+	if extra:
+		problems.append(f"{len(extra)} tasks were never reported as started")
+	running = [row for row in rows.values() if row[4]]
+	if len(running) > 1:
+		problems.append(f"{len(running)} tasks are running")
+	unstopped = [task_id for task_id in stopped if rows.get(task_id, (None,) * 5)[4]]
+	if unstopped:
+		problems.append(f"{len(unstopped)} stopped tasks are still running")
+
+	# Starts and stops are serialized, so in id order each task ends before the next starts
+	ordered = [rows[task_id] for task_id in sorted(rows)]
+	overlaps = sum(
+		1 for before, after in zip(ordered, ordered[1:])
+		if before[3] is None or before[3] > after[2]
+	)
+	if overlaps:
+		problems.append(f"{overlaps} tasks overlap the next one")
+
+	mismatches = db.verify_daily_totals()
+	if mismatches:
+		problems.append(f"{len(mismatches)} daily_totals rows disagree with the tasks")
+	errors = [error for seen in results for error in seen['errors']]
+	if errors:
+		problems.append(f"{len(errors)} calls failed, e.g. {errors[0]}")
+	return problems
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--workers", type=int, default=8)
+	parser.add_argument("--punches", type=int, default=200, help="start attempts per worker")
+	args = parser.parse_args()
+
+	context = multiprocessing.get_context("spawn")
+	with tempfile.TemporaryDirectory() as tmp:
+		path = str(Path(tmp) / "stress.db")
+		Database(path).close()
+
+		# Hold every worker at the gate until all have opened the database
+		ready, go, queue = context.Semaphore(0), context.Event(), context.Queue()
+		processes = [
+			context.Process(target=worker, args=(path, n, args.punches, ready, go, queue))
+			for n in range(args.workers)
+		]
+		for process in processes:
+			process.start()
+		for _ in processes:
+			ready.acquire()
+		start = time.perf_counter()
+		go.set()
+		results = [queue.get() for _ in processes]
+		elapsed = time.perf_counter() - start
+		for process in processes:
+			process.join()
+
+		with Database(path) as db:
+			problems = verify(db, results)
+			tasks = db.connection().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+	started = sum(len(seen['started']) for seen in results)
+	stopped = sum(len(seen['stopped']) for seen in results)
+	conflicts = sum(seen['conflicts'] for seen in results)
+	print(f"{args.workers} workers x {args.punches} punches in {elapsed:.2f}s")
+	print(f"  started {started:,}, stopped {stopped:,}, refused {conflicts:,} "
+		f"({(started + stopped) / elapsed:,.0f} writes/s), {tasks:,} tasks stored")
+	for problem in problems:
+		print(f"  FAIL: {problem}")
+	if problems:
+		sys.exit(1)
+	print("  OK: no lost, duplicated or overlapping punches")
+
+
+if __name__ == "__main__":
+	main()
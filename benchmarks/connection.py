@@ -0,0 +1,75 @@
+"""
+Micro-benchmark: persistent connection vs. connect-per-call
+
+Run from the repository root:
+
+	python -m benchmarks.connection [--calls N]
+"""
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from database import Database
+
+
+class PerCallDatabase(Database):
+	"""Database that reconnects on every call, like the original handler
+
+	Migrations need one connection throughout, so create the schema with a
+	plain Database before opening the file with this class.
+	"""
+
+	def connection(self):
+		self.close()
+		conn = sqlite3.connect(self.db_file, check_same_thread=False)
+		with self._lock:
+			self._connections.append(conn)
+		return conn
+
+
+def time_calls(fn, calls):
+	"""Return mean microseconds per call"""
+	start = time.perf_counter()
+	for _ in range(calls):
+		fn()
+	return (time.perf_counter() - start) / calls * 1e6
+
+
+def run(db_class, db_file, calls):
+	"""Time the common Database methods for one handler class"""
+	results = {}
+	Database(db_file).close()
+	with db_class(db_file) as db:
+		for i in range(200):
+			db.stop_task(db.start_task(f"Task {i}", "bench, email"))
+
+		results["get_running_task"] = time_calls(db.get_running_task, calls)
+		results["get_all_tasks"] = time_calls(db.get_all_tasks, calls)
+		results["get_all_tags"] = time_calls(db.get_all_tags, calls)
+		results["get_setting"] = time_calls(lambda: db.get_setting("dark_mode", "true"), calls)
+		results["start+stop_task"] = time_calls(
+			lambda: db.stop_task(db.start_task("Bench", "bench")), calls
+		)
+	return results
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--calls", type=int, default=500)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		per_call = run(PerCallDatabase, str(Path(tmp) / "per_call.db"), args.calls)
+		pooled = run(Database, str(Path(tmp) / "pooled.db"), args.calls)
+
+	print(f"{'method':<20}{'per-call (us)':>16}{'persistent (us)':>18}{'speedup':>10}")
+	for method, before in per_call.items():
+		after = pooled[method]
+		print(f"{method:<20}{before:>16.1f}{after:>18.1f}{before / after:>9.1f}x")
+
+
+if __name__ == "__main__":
+	main()
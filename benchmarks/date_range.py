@@ -0,0 +1,105 @@
+"""
+Benchmark: date-range summary queries with and without the start_ts index
+
+Fills a scratch database with synthetic tasks, prints EXPLAIN QUERY PLAN for
+the daily, weekly and monthly ranges, and times the legacy date() predicate
+against the index-friendly range predicate.
+
+	python -m benchmarks.date_range [--rows 1000000]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from database import LOCAL_DAY, Database, day_range, to_epoch
+
+
+LEGACY_SQL = f"SELECT * FROM tasks WHERE {LOCAL_DAY} BETWEEN ? AND ? ORDER BY start_ts DESC"
+RANGE_SQL = "SELECT * FROM tasks WHERE start_ts >= ? AND start_ts < ? ORDER BY start_ts DESC"
+
+
+def populate(db, rows, seed=1):
+	"""Insert ``rows`` completed tasks spread over the last few years"""
+	rng = random.Random(seed)
+	now = datetime.now()
+	span = 5 * 365 * 86400
+	conn = db.connection()
+	with conn:
+		batch = []
+		for _ in range(rows):
+			start_ts, tz_offset = to_epoch(now - timedelta(seconds=rng.randrange(span)))
+			duration = rng.randrange(60, 4 * 3600)
+			batch.append((
+				f"Task {rng.randrange(500)}",
+				"",
+				start_ts,
+				start_ts + duration,
+				duration,
+				tz_offset,
+			))
+			if len(batch) == 10000:
+				conn.executemany(
+					"INSERT INTO tasks (name, tags, start_ts, end_ts, duration_seconds, tz_offset) VALUES (?, ?, ?, ?, ?, ?)",
+					batch
+				)
+				batch = []
+		if batch:
+			conn.executemany(
+				"INSERT INTO tasks (name, tags, start_ts, end_ts, duration_seconds, tz_offset) VALUES (?, ?, ?, ?, ?, ?)",
+				batch
+			)
+	conn.execute("ANALYZE")
+
+
+def ranges():
+	"""Return the ranges used by the daily, weekly and monthly summaries"""
+	today = datetime.now().date()
+	return {
+		"daily": (today.isoformat(), today.isoformat()),
+		"weekly": ((today - timedelta(days=today.weekday())).isoformat(), today.isoformat()),
+		"monthly": (today.replace(day=1).isoformat(), today.isoformat()),
+	}
+
+
+def best_of(conn, sql, params, repeat):
+	"""Return the best wall time in milliseconds and the row count"""
+	best = None
+	for _ in range(repeat):
+		start = time.perf_counter()
+		count = len(conn.execute(sql, params).fetchall())
+		elapsed = (time.perf_counter() - start) * 1000
+		best = elapsed if best is None else min(best, elapsed)
+	return best, count
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--rows", type=int, default=1000000)
+	parser.add_argument("--repeat", type=int, default=5)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp, Database(str(Path(tmp) / "bench.db")) as db:
+		print(f"Populating {args.rows:,} tasks...")
+		populate(db, args.rows)
+		conn = db.connection()
+
+		for label, (start_date, end_date) in ranges().items():
+			params = day_range(start_date, end_date)
+			plan = conn.execute("EXPLAIN QUERY PLAN " + RANGE_SQL, params).fetchall()
+			legacy_ms, legacy_rows = best_of(conn, LEGACY_SQL, (start_date, end_date), args.repeat)
+			range_ms, range_rows = best_of(conn, RANGE_SQL, params, args.repeat)
+			assert legacy_rows == range_rows
+
+			print(f"\n{label} ({start_date} .. {end_date}), {range_rows:,} rows")
+			for row in plan:
+				print(f"  plan: {row[-1]}")
+			print(f"  date() BETWEEN: {legacy_ms:9.2f} ms")
+			print(f"  indexed range:  {range_ms:9.2f} ms  ({legacy_ms / range_ms:.0f}x)")
+
+
+if __name__ == "__main__":
+	main()
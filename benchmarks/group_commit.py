@@ -0,0 +1,94 @@
+"""
+Benchmark: punch throughput with and without the group-commit WriteQueue
+
+Times bursts of punches (task switches) on a fresh database per scenario:
+one transaction per punch at the default synchronous=NORMAL and at FULL
+(each punch on disk before it returns), then through Database.write_queue(),
+which is durable, both fired from one thread and from several threads that
+each wait for every acknowledgement. Every run is checked for lost punches.
+
+fsync costs differ widely between disks, so pass ``--dir`` to run on the
+disk that holds your real database.
+
+	python -m benchmarks.group_commit [--punches 5000] [--threads 8] [--dir .]
+"""
+
+import argparse
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from database import Database
+
+
+def direct(db, punches, threads, synchronous):
+	"""One transaction per punch, from ``threads`` threads"""
+	def produce(count):
+		db.connection().execute(f"PRAGMA synchronous = {synchronous}")
+		for i in range(count):
+			db.start_task(f"Punch {i}", "bench", switch=True)
+	run_threads(produce, punches, threads)
+
+
+def queued(db, punches, threads, wait_each, window):
+	"""Punches through the write queue, waiting for each one or only at the end"""
+	queue = db.write_queue(window=window)
+
+	def produce(count):
+		futures = []
+		for i in range(count):
+			future = queue.start_task(f"Punch {i}", "bench", switch=True)
+			if wait_each:
+				future.result()
+			futures.append(future)
+		for future in futures:
+			future.result()
+	run_threads(produce, punches, threads)
+	return queue.stats['commits']
+
+
+def run_threads(produce, punches, threads):
+	"""Split ``punches`` over ``threads`` threads running ``produce(count)``"""
+	workers = [threading.Thread(target=produce, args=(punches // threads,)) for _ in range(threads)]
+	for worker in workers:
+		worker.start()
+	for worker in workers:
+		worker.join()
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--punches", type=int, default=5000)
+	parser.add_argument("--threads", type=int, default=8)
+	parser.add_argument("--window", type=float, default=0.0, help="WriteQueue window in seconds")
+	parser.add_argument("--dir", help="directory for the scratch databases (default: a temporary one)")
+	args = parser.parse_args()
+	punches = args.punches - args.punches % args.threads
+
+	scenarios = [
+		("direct, NORMAL, 1 thread", lambda db: direct(db, punches, 1, "NORMAL")),
+		("direct, FULL, 1 thread", lambda db: direct(db, punches, 1, "FULL")),
+		(f"direct, FULL, {args.threads} threads", lambda db: direct(db, punches, args.threads, "FULL")),
+		("queue, 1 thread, burst", lambda db: queued(db, punches, 1, False, args.window)),
+		(f"queue, {args.threads} threads, burst", lambda db: queued(db, punches, args.threads, False, args.window)),
+		(f"queue, {args.threads} threads, wait each", lambda db: queued(db, punches, args.threads, True, args.window)),
+	]
+	print(f"{punches:,} punches per scenario")
+	print(f"  {'scenario':<32}{'punches/s':>12}{'commits':>10}")
+	with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+		for number, (label, scenario) in enumerate(scenarios):
+			# Every punch has been acknowledged when a scenario returns
+			with Database(str(Path(tmp) / f"bench_{number}.db")) as db:
+				start = time.perf_counter()
+				commits = scenario(db)
+				elapsed = time.perf_counter() - start
+			with Database(str(Path(tmp) / f"bench_{number}.db")) as db:
+				stored = db.connection().execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+				assert stored == punches, f"{label}: {stored} of {punches} punches stored"
+				assert not db.verify_daily_totals(), f"{label}: daily_totals out of step"
+			print(f"  {label:<32}{punches / elapsed:>12,.0f}{commits or punches:>10,}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,48 @@
+"""
+Benchmark: keyset pagination vs. LIMIT/OFFSET for task history
+
+	python -m benchmarks.pagination [--rows 1000000] [--page-size 100]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.date_range import populate
+from database import Database
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--rows", type=int, default=1000000)
+	parser.add_argument("--page-size", type=int, default=100)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp, Database(str(Path(tmp) / "bench.db")) as db:
+		print(f"Populating {args.rows:,} tasks...")
+		populate(db, args.rows)
+
+		pages = [p for p in (1, 10, 100, 1000, args.rows // args.page_size) if p * args.page_size <= args.rows]
+		print(f"{'page':>8}{'OFFSET (ms)':>14}{'keyset (ms)':>14}")
+		for page in pages:
+			offset = (page - 1) * args.page_size
+			start = time.perf_counter()
+			rows = db.get_all_tasks(limit=args.page_size, offset=offset)
+			offset_ms = (time.perf_counter() - start) * 1000
+
+			# The cursor is the last row of the previous page
+			cursor = None
+			if offset:
+				previous = db.get_all_tasks(limit=1, offset=offset - 1)[0]
+				cursor = (previous[3], previous[0])
+			start = time.perf_counter()
+			keyset = db.get_tasks_page(limit=args.page_size, after=cursor)
+			keyset_ms = (time.perf_counter() - start) * 1000
+
+			assert [r[0] for r in rows] == [r[0] for r in keyset]
+			print(f"{page:>8}{offset_ms:>14.2f}{keyset_ms:>14.2f}")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,119 @@
+"""
+Benchmark: requests per second through the local JSON API
+
+Imports synthetic tasks, starts ``timepunch.py serve`` in a separate
+process, then keeps N keep-alive connections busy for a few seconds per
+endpoint and reports requests per second and latency percentiles. Reads
+run side by side; the start endpoint measures the serialized write path.
+
+	python -m benchmarks.server [--rows 100000] [--connections 16] [--seconds 3] [--group-commit]
+"""
+
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.workload import generate_tasks
+from database import Database
+from server import ApiClient
+
+
+SCENARIOS = (
+	("GET /running", "GET", "/running", None),
+	("GET /tasks", "GET", "/tasks?limit=50", None),
+	("GET /tasks?q", "GET", "/tasks?q=review&limit=20", None),
+	("GET /summary month", "GET", "/summary?period=month", None),
+	("GET /summary year breakdown", "GET", "/summary?period=year&breakdown=1", None),
+	("POST /start (switch)", "POST", "/start", {'name': "Bench", 'tags': "bench", 'switch': True}),
+)
+
+
+def free_port():
+	"""Return a TCP port that is free right now"""
+	with socket.socket() as sock:
+		sock.bind(("127.0.0.1", 0))
+		return sock.getsockname()[1]
+
+
+async def wait_until_up(port, timeout=10):
+	"""Poll the server until it accepts connections"""
+	deadline = time.monotonic() + timeout
+	while True:
+		try:
+			client = await ApiClient(port=port).connect()
+			await client.close()
+			return
+		except OSError:
+			if time.monotonic() > deadline:
+				raise
+			await asyncio.sleep(0.05)
+
+
+async def hammer(port, method, target, data, connections, seconds):
+	"""Send requests on every connection for ``seconds``; return latencies in seconds"""
+	clients = [await ApiClient(port=port).connect() for _ in range(connections)]
+	deadline = time.perf_counter() + seconds
+	latencies = []
+
+	async def loop(client):
+		while time.perf_counter() < deadline:
+			start = time.perf_counter()
+			status, payload = await client.request(method, target, data)
+			latencies.append(time.perf_counter() - start)
+			assert status < 400, payload
+
+	start = time.perf_counter()
+	await asyncio.gather(*(loop(client) for client in clients))
+	elapsed = time.perf_counter() - start
+	for client in clients:
+		await client.close()
+	return latencies, elapsed
+
+
+async def run(port, connections, seconds):
+	await wait_until_up(port)
+	print(f"\n  {'endpoint':<30}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+	for label, method, target, data in SCENARIOS:
+		latencies, elapsed = await hammer(port, method, target, data, connections, seconds)
+		latencies.sort()
+		p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+		print(f"  {label:<30}{len(latencies) / elapsed:>10,.0f}"
+			f"{statistics.median(latencies) * 1e3:>10.2f}{p99 * 1e3:>10.2f}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--rows", type=int, default=100000)
+	parser.add_argument("--connections", type=int, default=16)
+	parser.add_argument("--seconds", type=float, default=3.0, help="duration of each endpoint's run")
+	parser.add_argument("--group-commit", action="store_true", help="run the server with --group-commit")
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmp:
+		path = str(Path(tmp) / "bench.db")
+		with Database(path) as db:
+			print(f"Importing {args.rows:,} tasks...")
+			db.import_tasks(generate_tasks(args.rows))
+
+		port = free_port()
+		root = Path(__file__).resolve().parent.parent
+		command = [sys.executable, str(root / "timepunch.py"), "--db", path, "serve", "--port", str(port)]
+		if args.group_commit:
+			command.append("--group-commit")
+		server = subprocess.Popen(command, stderr=subprocess.DEVNULL)
+		try:
+			print(f"{args.connections} connections, {args.seconds:g}s per endpoint")
+			asyncio.run(run(port, args.connections, args.seconds))
+		finally:
+			server.terminate()
+			server.wait()
+
+
+if __name__ == "__main__":
+	main()
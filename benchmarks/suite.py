@@ -0,0 +1,190 @@
+"""
+Benchmark suite for the TimePunch database layer
+
+Builds databases of synthetic tasks (see benchmarks.workload), times every
+public Database method plus summary generation, and writes the results as
+JSON so runs can be compared:
+
+	python -m benchmarks.suite --sizes 10000,100000,1000000 -o before.json
+	python -m benchmarks.suite -o after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from benchmarks.workload import generate_tasks
+from database import Database
+from reports import generate_summary, period_range
+
+
+def measure(fn, calls, setup=None, teardown=None):
+	"""Call ``fn`` ``calls`` times and return latency statistics in microseconds
+
+	``fn`` receives the call number, or ``setup(i)`` when a setup is given.
+	``setup`` and ``teardown(result)`` run untimed around each call, e.g. to
+	start a task before timing its stop.
+	"""
+	samples = []
+	for i in range(calls):
+		arg = setup(i) if setup is not None else i
+		start = time.perf_counter()
+		result = fn(arg)
+		samples.append((time.perf_counter() - start) * 1e6)
+		if teardown is not None:
+			teardown(result)
+	samples.sort()
+	return {
+		'calls': calls,
+		'min_us': round(samples[0], 1),
+		'median_us': round(statistics.median(samples), 1),
+		'p95_us': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 1),
+		'mean_us': round(statistics.fmean(samples), 1),
+	}
+
+
+def run_size(size, calls, tmp, seed):
+	"""Build a database with ``size`` tasks and time each operation on it"""
+	path = Path(tmp) / f"bench_{size}.db"
+	results = {}
+	with Database(str(path)) as db:
+		start = time.perf_counter()
+		db.import_tasks(generate_tasks(size, seed=seed))
+		results['import_tasks'] = {'calls': 1, 'total_s': round(time.perf_counter() - start, 3)}
+
+		rng = random.Random(seed)
+		max_id = db.connection().execute("SELECT MAX(id) FROM tasks").fetchone()[0]
+		today = datetime.now().date()
+		week = period_range('week')
+		month = period_range('month')
+		year = ((today - timedelta(days=365)).isoformat(), today.isoformat())
+
+		# Only one task runs at a time, so each timed start is stopped untimed and vice versa
+		started = []
+		results['start_task'] = measure(
+			lambda i: db.start_task(f"Bench {i}", "bench, dev"), calls,
+			teardown=lambda task_id: started.append(task_id) or db.stop_task(task_id)
+		)
+		results['stop_task'] = measure(
+			db.stop_task, calls,
+			setup=lambda i: db.start_task(f"Bench stop {i}", "bench")
+		)
+
+		running = db.start_task("Bench running", "bench")
+		results['get_running_task'] = measure(lambda i: db.get_running_task(), calls)
+		db.stop_task(running)
+
+		results['get_task'] = measure(lambda i: db.get_task(rng.randint(1, max_id)), calls)
+		results['get_all_tasks'] = measure(lambda i: db.get_all_tasks(), calls)
+		deep = db.get_all_tasks(limit=1, offset=min(size - 1, 10000))[0]
+		results['get_tasks_page_deep'] = measure(
+			lambda i: db.get_tasks_page(after=(deep[3], deep[0])), calls
+		)
+		results['search_tasks_common'] = measure(lambda i: db.search_tasks("review"), calls)
+		results['search_tasks_specific'] = measure(lambda i: db.search_tasks("fix login"), calls)
+		results['get_tasks_by_date_range_week'] = measure(lambda i: db.get_tasks_by_date_range(*week), calls)
+		results['get_tasks_by_date_range_month'] = measure(lambda i: db.get_tasks_by_date_range(*month), calls)
+		results['get_all_tags'] = measure(lambda i: db.get_all_tags(), calls)
+		# Reports are cached until their range changes, so the uncached cost is timed separately
+		results['get_summary_month_uncached'] = measure(
+			lambda i: db.get_summary(*month), calls, setup=lambda i: db.clear_summary_cache()
+		)
+		results['get_summary_year_uncached'] = measure(
+			lambda i: db.get_summary(*year), calls, setup=lambda i: db.clear_summary_cache()
+		)
+		results['get_summary_month'] = measure(lambda i: db.get_summary(*month), calls)
+		results['generate_summary_week'] = measure(lambda i: generate_summary(db, *week, "Weekly"), calls)
+		results['generate_summary_month'] = measure(lambda i: generate_summary(db, *month, "Monthly"), calls)
+		results['generate_summary_year'] = measure(lambda i: generate_summary(db, *year, "Yearly"), calls)
+		results['get_setting'] = measure(lambda i: db.get_setting('dark_mode', 'true'), calls)
+		results['set_setting'] = measure(lambda i: db.set_setting('bench', str(i)), calls)
+
+		results['update_task'] = measure(
+			lambda task: db.update_task(task[0], task[1] + "!", task[2], task[3], task[4]), calls,
+			setup=lambda i: db.get_task(started[i])
+		)
+		results['delete_task'] = measure(lambda i: db.delete_task(started[i]), calls)
+	return results
+
+
+def print_table(size, results):
+	"""Print one size's timings as a table on stderr"""
+	print(f"\n{size:,} tasks", file=sys.stderr)
+	print(f"  {'operation':<32}{'median us':>12}{'p95 us':>12}{'mean us':>12}", file=sys.stderr)
+	for name, stats in results.items():
+		if 'median_us' in stats:
+			print(f"  {name:<32}{stats['median_us']:>12.1f}{stats['p95_us']:>12.1f}{stats['mean_us']:>12.1f}",
+				file=sys.stderr)
+		else:
+			print(f"  {name:<32}{stats['total_s']:>11.3f}s", file=sys.stderr)
+
+
+def compare(current, baseline, threshold):
+	"""Print median ratios against a baseline run and return the regressions"""
+	regressions = []
+	print(f"\n{'size':>9}  {'operation':<32}{'baseline':>12}{'current':>12}{'ratio':>8}", file=sys.stderr)
+	for size, operations in current['results'].items():
+		for name, stats in operations.items():
+			before = baseline['results'].get(size, {}).get(name)
+			if not before or 'median_us' not in stats or 'median_us' not in before:
+				continue
+			ratio = stats['median_us'] / before['median_us'] if before['median_us'] else float('inf')
+			flag = "  REGRESSION" if ratio > threshold else ""
+			print(f"{size:>9}  {name:<32}{before['median_us']:>12.1f}{stats['median_us']:>12.1f}"
+				f"{ratio:>7.2f}x{flag}", file=sys.stderr)
+			if flag:
+				regressions.append((size, name, ratio))
+	return regressions
+
+
+def main():
+	parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+	parser.add_argument("--sizes", default="10000,100000,1000000",
+		help="comma-separated task counts (default: %(default)s)")
+	parser.add_argument("--calls", type=int, default=200, help="timed calls per operation")
+	parser.add_argument("--seed", type=int, default=42)
+	parser.add_argument("-o", "--output", default="-", help="JSON output file (default: stdout)")
+	parser.add_argument("--compare", help="baseline JSON from an earlier run")
+	parser.add_argument("--threshold", type=float, default=1.25,
+		help="median slowdown ratio reported as a regression (default: %(default)s)")
+	args = parser.parse_args()
+
+	report = {
+		'meta': {
+			'timestamp': datetime.now().isoformat(timespec='seconds'),
+			'python': platform.python_version(),
+			'sqlite': sqlite3.sqlite_version,
+			'platform': platform.platform(),
+			'calls': args.calls,
+			'seed': args.seed,
+		},
+		'results': {},
+	}
+	with tempfile.TemporaryDirectory() as tmp:
+		for size in (int(s) for s in args.sizes.split(',')):
+			print(f"Benchmarking {size:,} tasks...", file=sys.stderr)
+			report['results'][str(size)] = run_size(size, args.calls, tmp, args.seed)
+			print_table(size, report['results'][str(size)])
+
+	text = json.dumps(report, indent=2)
+	if args.output == '-':
+		print(text)
+	else:
+		Path(args.output).write_text(text + "\n")
+
+	if args.compare:
+		baseline = json.loads(Path(args.compare).read_text())
+		if compare(report, baseline, args.threshold):
+			sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
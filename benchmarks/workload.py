@@ -0,0 +1,65 @@
+"""
+Synthetic workload generator for TimePunch benchmarks
+
+Produces import records with skewed (Zipf-like) task name and tag
+popularity, working-hours start times and log-normal durations, so the
+data looks like years of real tracking rather than uniform noise.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+
+VERBS = ["Review", "Write", "Fix", "Plan", "Debug", "Test", "Deploy", "Design", "Document", "Refactor",
+	"Research", "Triage", "Support", "Meet about", "Prototype"]
+OBJECTS = ["API", "login flow", "billing", "reports", "dashboard", "CI pipeline", "release", "database",
+	"search", "onboarding", "docs", "infra", "mobile app", "metrics", "invoices", "backlog", "roadmap",
+	"customer ticket", "security audit", "performance"]
+TAGS = ["dev", "email", "meeting", "research", "admin", "review", "support", "ops", "planning", "docs",
+	"client-a", "client-b", "client-c", "internal", "hiring", "training", "oncall", "design", "qa", "travel",
+	"sales", "finance", "legal", "infra", "frontend", "backend", "mobile", "data", "ml", "security"]
+
+
+def zipf_weights(count, exponent=1.1):
+	"""Return Zipf weights for ``count`` ranked items"""
+	return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def generate_tasks(count, seed=42, end=None):
+	"""Yield ``count`` task records ({name, tags, start, end}) in chronological order"""
+	rng = random.Random(seed)
+	names = [f"{verb} {obj}" for verb in VERBS for obj in OBJECTS]
+	rng.shuffle(names)
+	name_weights = zipf_weights(len(names))
+	tag_weights = zipf_weights(len(TAGS))
+
+	# Roughly ten tasks per working day, ending today
+	days = max(1, count // 10)
+	end = (end or datetime.now()).date()
+	workdays = []
+	day = end
+	while len(workdays) < days:
+		if day.weekday() < 5:
+			workdays.append(day)
+		day -= timedelta(days=1)
+	workdays.reverse()
+
+	current_day = None
+	for index in range(count):
+		day = workdays[index * days // count]
+		if day != current_day:
+			current_day = day
+			moment = datetime.combine(day, datetime.min.time()) + timedelta(hours=8, minutes=rng.randrange(60))
+
+		duration = int(min(4 * 3600, max(60, rng.lognormvariate(math.log(25 * 60), 0.8))))
+		tag_count = rng.choices([0, 1, 2, 3], weights=[15, 50, 25, 10])[0]
+		tags = sorted(set(rng.choices(TAGS, weights=tag_weights, k=tag_count)))
+
+		yield {
+			'name': rng.choices(names, weights=name_weights)[0],
+			'tags': ", ".join(tags),
+			'start': moment.isoformat(),
+			'end': (moment + timedelta(seconds=duration)).isoformat(),
+		}
+		moment += timedelta(seconds=duration + rng.randrange(0, 20 * 60))
@@ -0,0 +1,248 @@
+"""
+Command-line interface for TimePunch
+
+Only uses the database layer, so it starts without importing Qt.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from database import Database, TaskAlreadyRunning
+from metrics import QueryMetrics
+from reports import generate_summary, generate_breakdown, export_summary, period_range, PERIOD_TITLES
+
+
+def format_elapsed(seconds):
+	"""Format seconds as HH:MM:SS"""
+	hours, remainder = divmod(int(seconds), 3600)
+	minutes, seconds = divmod(remainder, 60)
+	return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def cmd_start(db, args):
+	"""Start a task, optionally stopping the running one first"""
+	running = db.get_running_task()
+	try:
+		# The check above is only for the message; start_task decides atomically
+		db.start_task(args.name, args.tags, switch=args.switch)
+	except TaskAlreadyRunning as e:
+		print(f"Already tracking '{e.name}' (use --switch to stop it)", file=sys.stderr)
+		return 1
+	if running:
+		print(f"Stopped: {running[1]}")
+	print(f"Started: {args.name}")
+	return 0
+
+
+def cmd_stop(db, args):
+	"""Stop the running task"""
+	running = db.get_running_task()
+	if not running:
+		print("No active task", file=sys.stderr)
+		return 1
+	if not db.stop_task(running[0]):
+		print(f"'{running[1]}' was stopped meanwhile", file=sys.stderr)
+		return 1
+	task = db.get_task(running[0])
+	print(f"Stopped: {task[1]} ({format_elapsed(task[5] or 0)})")
+	return 0
+
+
+def cmd_status(db, args):
+	"""Print the running task and its elapsed time"""
+	running = db.get_running_task()
+	if not running:
+		print("No active task")
+		return 0
+	elapsed = time.time() - running[3]
+	tags = f" [{running[2]}]" if running[2] else ""
+	print(f"{running[1]}{tags} {format_elapsed(elapsed)}")
+	return 0
+
+
+def cmd_summary(db, args):
+	"""Print a summary for a period or explicit date range"""
+	start_date, end_date = period_range(args.period)
+	title = PERIOD_TITLES[args.period]
+	if args.start or args.end:
+		start_date = args.start or start_date
+		end_date = args.end or end_date
+		title = f"Summary for {start_date} to {end_date}"
+	report = generate_breakdown if args.breakdown else generate_summary
+	print(report(db, start_date, end_date, title))
+	return 0
+
+
+def cmd_list(db, args):
+	"""Print recent tasks, or the best matches for a search"""
+	if args.search:
+		tasks = db.search_tasks(args.search, limit=args.limit)
+	else:
+		tasks = db.get_tasks_page(limit=args.limit, name=args.name, tag=args.tag)
+	for task in tasks:
+		start = datetime.fromtimestamp(task[3]).strftime("%Y-%m-%d %H:%M")
+		duration = format_elapsed(task[5] or 0) if task[4] else "running "
+		tags = f" [{task[2]}]" if task[2] else ""
+		print(f"{task[0]:>6}  {start}  {duration}  {task[1]}{tags}")
+	return 0
+
+
+def cmd_serve(db, args):
+	"""Serve the local JSON API until interrupted"""
+	# Imported here so other commands do not pay for asyncio
+	import asyncio
+	from server import serve
+	try:
+		asyncio.run(serve(db, args.host, args.port, args.socket, args.group_commit))
+	except KeyboardInterrupt:
+		pass
+	return 0
+
+
+def cmd_rollup(db, args):
+	"""Verify or rebuild the daily_totals rollup"""
+	if args.action == 'rebuild':
+		db.rebuild_daily_totals()
+		print("daily_totals rebuilt")
+		return 0
+
+	mismatches = db.verify_daily_totals()
+	for day, name, tag, expected, actual in mismatches:
+		print(f"{day} {name!r} {tag!r}: expected {expected}, found {actual}")
+	print(f"{len(mismatches)} mismatched rows")
+	return 1 if mismatches else 0
+
+
+def cmd_import(db, args):
+	"""Import tasks from a CSV or JSON-lines file"""
+	try:
+		result = db.import_file(args.file, fmt=args.format, skip_duplicates=args.skip_duplicates)
+	except (OSError, ValueError) as e:
+		print(f"Import failed: {e}", file=sys.stderr)
+		return 1
+	print(f"Imported {result['imported']} tasks, skipped {result['skipped']} duplicates")
+	return 0
+
+
+def cmd_export(db, args):
+	"""Stream tasks or a summary to a file or stdout"""
+	out = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+	try:
+		if args.what == 'summary':
+			start_date, end_date = period_range(args.period)
+			summary = db.get_summary(args.start or start_date, args.end or end_date)
+			export_summary(summary, out, args.format)
+		else:
+			db.export_tasks(
+				out, args.format, running=args.running, name=args.name, tag=args.tag,
+				start_date=args.start, end_date=args.end
+			)
+		out.flush()
+	except BrokenPipeError:
+		# Reader went away (e.g. piped to head); silence the flush at exit
+		os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+	finally:
+		if out is not sys.stdout:
+			out.close()
+	return 0
+
+
+def build_parser():
+	"""Build the argument parser for all commands"""
+	parser = argparse.ArgumentParser(prog="timepunch", description="TimePunch time tracker")
+	parser.add_argument("--db", default="timepunch.db", help="database file (default: %(default)s)")
+	parser.add_argument("--metrics", action="store_true",
+		help="print per-method query metrics to stderr when the command finishes")
+	parser.add_argument("--metrics-json", metavar="FILE", help="write query metrics as JSON ('-' for stdout)")
+	parser.add_argument("--slow-ms", type=float, metavar="MS",
+		help="log queries slower than MS milliseconds to stderr (enables metrics)")
+	commands = parser.add_subparsers(dest="command", required=True)
+
+	start = commands.add_parser("start", help="start a task")
+	start.add_argument("name")
+	start.add_argument("-t", "--tags", default="", help="comma-separated tags")
+	start.add_argument("--switch", action="store_true", help="stop the running task first")
+	start.set_defaults(func=cmd_start)
+
+	stop = commands.add_parser("stop", help="stop the running task")
+	stop.set_defaults(func=cmd_stop)
+
+	status = commands.add_parser("status", help="show the running task")
+	status.set_defaults(func=cmd_status)
+
+	summary = commands.add_parser("summary", help="print a time summary")
+	summary.add_argument("period", nargs="?", choices=sorted(PERIOD_TITLES), default="day")
+	summary.add_argument("--from", dest="start", help="start date (YYYY-MM-DD)")
+	summary.add_argument("--to", dest="end", help="end date (YYYY-MM-DD)")
+	summary.add_argument("--breakdown", action="store_true",
+		help="break time down by weekday, task, tag and day from the raw tasks")
+	summary.set_defaults(func=cmd_summary)
+
+	list_cmd = commands.add_parser("list", help="list recent tasks")
+	list_cmd.add_argument("-n", "--limit", type=int, default=20)
+	list_cmd.add_argument("--name", help="only tasks with this exact name")
+	list_cmd.add_argument("--tag", help="only tasks with this tag")
+	list_cmd.add_argument("-s", "--search", help="full-text search over names and tags (prefix match)")
+	list_cmd.set_defaults(func=cmd_list)
+
+	import_cmd = commands.add_parser("import", help="import tasks from CSV or JSON lines")
+	import_cmd.add_argument("file", help="file with name, tags, start, end fields ('-' for stdin)")
+	import_cmd.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+	import_cmd.add_argument("--skip-duplicates", action="store_true",
+		help="skip tasks whose name and start time already exist")
+	import_cmd.set_defaults(func=cmd_import)
+
+	export = commands.add_parser("export", help="export tasks or a summary as CSV or JSON lines")
+	export.add_argument("what", nargs="?", choices=["tasks", "summary"], default="tasks")
+	export.add_argument("--format", choices=["csv", "jsonl"], default="csv")
+	export.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+	export.add_argument("--from", dest="start", help="start date (YYYY-MM-DD)")
+	export.add_argument("--to", dest="end", help="end date (YYYY-MM-DD)")
+	export.add_argument("--tag", help="only tasks with this tag")
+	export.add_argument("--name", help="only tasks with this exact name")
+	export.add_argument("--running", action="store_true",
+		help="include the running task, with an empty end (it cannot be imported)")
+	export.add_argument("--period", choices=sorted(PERIOD_TITLES), default="month",
+		help="summary period when --from/--to are not given")
+	export.set_defaults(func=cmd_export)
+
+	serve = commands.add_parser("serve", help="serve a local JSON API for integrations")
+	serve.add_argument("--host", default="127.0.0.1", help="address to listen on (default: %(default)s)")
+	serve.add_argument("--port", type=int, default=8765, help="TCP port (default: %(default)s)")
+	serve.add_argument("--socket", metavar="PATH", help="listen on a unix socket instead of TCP")
+	serve.add_argument("--group-commit", action="store_true",
+		help="commit bursts of starts and stops together, each durable on disk when acknowledged")
+	serve.set_defaults(func=cmd_serve)
+
+	rollup = commands.add_parser("rollup", help="verify or rebuild the daily totals rollup")
+	rollup.add_argument("action", choices=["verify", "rebuild"])
+	rollup.set_defaults(func=cmd_rollup)
+
+	return parser
+
+
+def main(argv=None):
+	"""Run a command and return its exit code"""
+	args = build_parser().parse_args(argv)
+	metrics = None
+	if args.metrics or args.metrics_json or args.slow_ms is not None:
+		metrics = QueryMetrics(stream=sys.stderr)
+		if args.slow_ms is not None:
+			metrics.slow_ms = args.slow_ms
+	with Database(args.db, metrics=metrics) as db:
+		code = args.func(db, args)
+
+	if args.metrics:
+		print(metrics.format_report(histograms=True), file=sys.stderr)
+	if args.metrics_json:
+		text = json.dumps(metrics.snapshot(), indent=2)
+		if args.metrics_json == '-':
+			print(text)
+		else:
+			with open(args.metrics_json, 'w', encoding='utf-8') as out:
+				out.write(text + "\n")
+	return code
@@ -0,0 +1,206 @@
+"""
+Columnar task result sets for TimePunch analytics
+
+Reports over long ranges read every completed task. Keeping them as
+typed arrays instead of row tuples takes a fraction of the memory, and
+the breakdowns below are whole-column operations: NumPy ``bincount``
+when NumPy is installed, a single pass over the arrays otherwise.
+"""
+
+import functools
+from array import array
+from datetime import date, timedelta
+
+
+WEEKDAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+# 1970-01-01, day 0 of the local day numbers, was a Thursday
+EPOCH_WEEKDAY = 3
+EPOCH_DATE = date(1970, 1, 1)
+
+# Smaller results are summed in pure Python, which beats importing NumPy
+NUMPY_MIN_ROWS = 20000
+
+# Separates task names in the concatenated name column (names may contain commas)
+NAME_SEPARATOR = "\x1f"
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy():
+	"""Import NumPy on first use, or return None without it
+
+	NumPy is optional, and importing it takes longer than most CLI
+	commands, so it is only loaded once a large report needs it.
+	"""
+	try:
+		import numpy
+	except ImportError:
+		return None
+	return numpy
+
+
+def group_sum(codes, weights, size, numpy=None):
+	"""Return a list of the summed ``weights`` for each code in range(size)"""
+	if numpy is not None and len(codes):
+		totals = numpy.bincount(numpy.asarray(codes), weights=numpy.asarray(weights), minlength=size)
+		return [int(total) for total in totals]
+	totals = [0] * size
+	for code, weight in zip(codes, weights):
+		totals[code] += weight
+	return totals
+
+
+def parse_ints(text, typecode, numpy=None):
+	"""Parse comma-separated integers into an array"""
+	if numpy is not None:
+		return array(typecode, numpy.fromstring(text, dtype=numpy.int64, sep=",").astype(typecode).tobytes())
+	return array(typecode, map(int, text.split(",")))
+
+
+def iter_names(text, chunk_size=1 << 20):
+	"""Yield the names in a NAME_SEPARATOR-joined string, splitting about ``chunk_size`` characters at a time"""
+	start = 0
+	while True:
+		end = text.find(NAME_SEPARATOR, start + chunk_size)
+		if end == -1:
+			yield from text[start:].split(NAME_SEPARATOR)
+			return
+		yield from text[start:end].split(NAME_SEPARATOR)
+		start = end + 1
+
+
+def ranked(labels, totals):
+	"""Return (label, total) pairs with a non-zero total, largest first"""
+	pairs = [(label, total) for label, total in zip(labels, totals) if total]
+	pairs.sort(key=lambda pair: (-pair[1], pair[0]))
+	return pairs
+
+
+class TaskColumns:
+	"""Completed tasks as parallel typed arrays
+
+	Row ``i`` is the task with id ``ids[i]``, in no particular order. Names
+	are dictionary-encoded (``names[name_codes[i]]``). Tags are stored as
+	(row, tag code) pairs since a task can have several, with the tags
+	table ids as codes: ``tags[tag_codes[j]]`` is a tag of row ``tag_rows[j]``.
+	"""
+
+	def __init__(self):
+		self.ids = array('q')
+		self.start = array('q')       # UTC epoch seconds
+		self.offset = array('i')      # UTC offset the task was recorded with, seconds
+		self.duration = array('q')    # seconds
+		self.name_codes = array('i')
+		self.names = []
+		self.tag_rows = array('i')
+		self.tag_codes = array('i')
+		self.tags = []
+
+	def __len__(self):
+		return len(self.ids)
+
+	@classmethod
+	def load(cls, task_row, tag_row, tags):
+		"""Build the columns from group_concat() text
+
+		``task_row`` holds comma-separated ids, start times, offsets and
+		durations, then names separated by NAME_SEPARATOR, in matching order;
+		``tag_row`` holds the task ids and tag ids of their tags, and
+		``tags`` lists tag names by id. Parsing a few long strings is much
+		cheaper than creating a Python object for every value of every row.
+		"""
+		columns = cls()
+		columns.tags = tags
+		ids, starts, offsets, durations, names = task_row
+		if ids is None:
+			return columns
+		numpy = load_numpy() if ids.count(",") + 1 >= NUMPY_MIN_ROWS else None
+		columns.ids = parse_ints(ids, 'q', numpy)
+		columns.start = parse_ints(starts, 'q', numpy)
+		columns.offset = parse_ints(offsets, 'i', numpy)
+		columns.duration = parse_ints(durations, 'q', numpy)
+		name_index = {}
+		# setdefault gives a new name the next code, as len() is read before the insert
+		columns.name_codes = array('i', [name_index.setdefault(name, len(name_index))
+			for name in iter_names(names)])
+		columns.names = list(name_index)
+
+		task_ids, tag_ids = tag_row
+		if task_ids is not None:
+			columns.tag_codes = parse_ints(tag_ids, 'i', numpy)
+			task_ids = parse_ints(task_ids, 'q', numpy)
+			if numpy is not None:
+				# Binary search the ids in sorted order for each tagged task's row
+				ids = numpy.asarray(columns.ids)
+				order = numpy.argsort(ids)
+				rows = order[numpy.searchsorted(ids[order], numpy.asarray(task_ids))]
+				columns.tag_rows = array('i', rows.astype('i').tobytes())
+			else:
+				row_of = dict(zip(columns.ids, range(len(columns.ids))))
+				columns.tag_rows = array('i', map(row_of.__getitem__, task_ids))
+		return columns
+
+	def _numpy(self):
+		"""Return the NumPy module to use for this result, or None for pure Python"""
+		return load_numpy() if len(self) >= NUMPY_MIN_ROWS else None
+
+	def nbytes(self):
+		"""Return the size of the array buffers in bytes"""
+		arrays = (self.ids, self.start, self.offset, self.duration, self.name_codes, self.tag_rows, self.tag_codes)
+		return sum(len(column) * column.itemsize for column in arrays)
+
+	def total_seconds(self):
+		"""Return the summed duration of every task"""
+		numpy = self._numpy()
+		if numpy is not None:
+			return int(numpy.asarray(self.duration).sum())
+		return sum(self.duration)
+
+	def local_days(self):
+		"""Return each task's start day, in its recorded offset, as days since 1970-01-01"""
+		numpy = self._numpy()
+		if numpy is not None:
+			return (numpy.asarray(self.start) + numpy.asarray(self.offset)) // 86400
+		return array('i', [(start + offset) // 86400 for start, offset in zip(self.start, self.offset)])
+
+	def by_name(self):
+		"""Return (task name, seconds) pairs, largest first"""
+		return ranked(self.names, group_sum(self.name_codes, self.duration, len(self.names), self._numpy()))
+
+	def by_tag(self):
+		"""Return (tag, seconds) pairs, largest first"""
+		numpy = self._numpy()
+		if numpy is not None and len(self.tag_rows):
+			weights = numpy.asarray(self.duration)[numpy.asarray(self.tag_rows)]
+		else:
+			weights = [self.duration[row] for row in self.tag_rows]
+		return ranked(self.tags, group_sum(self.tag_codes, weights, len(self.tags), numpy))
+
+	def by_day(self):
+		"""Return (ISO date, seconds) pairs for days with tracked time, oldest first"""
+		if not len(self):
+			return []
+		numpy = self._numpy()
+		days = self.local_days()
+		if numpy is not None:
+			first, last = int(days.min()), int(days.max())
+			offsets = days - first
+		else:
+			first, last = min(days), max(days)
+			offsets = array('i', [day - first for day in days])
+		totals = group_sum(offsets, self.duration, last - first + 1, numpy)
+		start = EPOCH_DATE + timedelta(days=first)
+		return [
+			((start + timedelta(days=offset)).isoformat(), total)
+			for offset, total in enumerate(totals) if total
+		]
+
+	def by_weekday(self):
+		"""Return (weekday name, seconds) pairs from Monday to Sunday"""
+		numpy = self._numpy()
+		days = self.local_days()
+		if numpy is not None:
+			weekdays = (days + EPOCH_WEEKDAY) % 7
+		else:
+			weekdays = array('i', [(day + EPOCH_WEEKDAY) % 7 for day in days])
+		return list(zip(WEEKDAYS, group_sum(weekdays, self.duration, 7, numpy)))
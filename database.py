@@ -2,23 +2,432 @@
 Database handler for TimePunch
 """
 
+import csv
+import functools
+import json
+import random
+import re
 import sqlite3
-from datetime import datetime
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+from columns import NAME_SEPARATOR, TaskColumns
+from metrics import QueryMetrics, count_rows
+
+
+# Applied to every connection when it is opened. WAL lets readers and the
+# writer work side by side, and NORMAL sync is safe under WAL while avoiding
+# an fsync on every commit.
+PRAGMAS = (
+	("journal_mode", "WAL"),
+	("synchronous", "NORMAL"),
+	("cache_size", -16000),         # ~16 MB page cache
+	("mmap_size", 268435456),       # 256 MB memory-mapped I/O
+	("busy_timeout", 5000),         # ms to wait on a locked database
+	("temp_store", "MEMORY"),
+	("foreign_keys", "ON"),
+)
+
+
+# Schema version stored in PRAGMA user_version; init_db migrates older
+# databases up to it (see Database.MIGRATIONS)
+SCHEMA_VERSION = 4
+
+# The calendar day a task started on, in the UTC offset it was recorded with
+LOCAL_DAY = "date(tasks.start_ts + tasks.tz_offset, 'unixepoch')"
+
+# Expected contents of daily_totals, computed from the raw tables. The row with
+# tag '' holds the task's total for the day; the others hold per-tag totals.
+# {where} may restrict the tasks; its parameters are then needed twice.
+ROLLUP_SQL = f"""
+	SELECT {LOCAL_DAY} AS day, name, '' AS tag,
+		COALESCE(SUM(duration_seconds), 0) AS seconds, COUNT(*) AS task_count
+	FROM tasks
+	WHERE end_ts IS NOT NULL {{where}}
+	GROUP BY day, name
+	UNION ALL
+	SELECT {LOCAL_DAY} AS day, tasks.name, tags.name AS tag,
+		COALESCE(SUM(tasks.duration_seconds), 0) AS seconds, COUNT(*) AS task_count
+	FROM tasks
+	JOIN task_tags ON task_tags.task_id = tasks.id
+	JOIN tags ON tags.id = task_tags.tag_id
+	WHERE tasks.end_ts IS NOT NULL {{where}}
+	GROUP BY day, tasks.name, tags.name
+"""
+# Restricts ROLLUP_SQL to days first..last. The epoch bounds (widened by a
+# day for tasks recorded in other time zones) let it use the start_ts index.
+ROLLUP_RANGE = f"AND tasks.start_ts >= ? AND tasks.start_ts < ? AND {LOCAL_DAY} BETWEEN ? AND ?"
+# Restricts ROLLUP_SQL to the tasks staged by _stage_ids
+ROLLUP_BATCH = "AND tasks.id IN (SELECT id FROM temp.batch_ids)"
+
+# Column names accepted by the importers, mapped to the canonical field
+IMPORT_FIELDS = {
+	'name': 'name', 'task': 'name',
+	'tags': 'tags',
+	'start': 'start', 'start_time': 'start',
+	'end': 'end', 'end_time': 'end',
+}
+
+
+# Keep the full-text index over task names and tags in sync with tasks.
+# tasks_fts is only created when the SQLite build includes FTS5.
+FTS_TRIGGERS = {
+	'tasks_fts_insert': """
+		CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN
+			INSERT INTO tasks_fts (rowid, name, tags) VALUES (new.id, new.name, new.tags);
+		END
+	""",
+	'tasks_fts_delete': """
+		CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN
+			INSERT INTO tasks_fts (tasks_fts, rowid, name, tags) VALUES ('delete', old.id, old.name, old.tags);
+		END
+	""",
+	# Stopping a task only touches end_ts, so it does not fire this
+	'tasks_fts_update': """
+		CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF name, tags ON tasks BEGIN
+			INSERT INTO tasks_fts (tasks_fts, rowid, name, tags) VALUES ('delete', old.id, old.name, old.tags);
+			INSERT INTO tasks_fts (rowid, name, tags) VALUES (new.id, new.name, new.tags);
+		END
+	""",
+}
+
+# bm25 column weights: a match in the task name counts more than one in its tags
+FTS_RANK = "bm25(tasks_fts, 2.0, 1.0)"
+# Searches matching more tasks than this are listed newest first instead of
+# ranked, since bm25 has to score every match before the first page
+FTS_RANK_LIMIT = 5000
+
+# Attempts at a write that finds the database locked, and the first backoff
+# delay in seconds (doubled on each retry)
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.05
+
+# Reports kept in memory per handler, and rows kept in the summary_cache table
+SUMMARY_CACHE_SIZE = 32
+SUMMARY_CACHE_ROWS = 256
+
+# Columns written by export_tasks; start and end are ISO 8601 with UTC offset
+EXPORT_FIELDS = ('id', 'name', 'tags', 'start', 'end', 'duration_seconds')
+
+# Methods timed when query metrics are enabled
+INSTRUMENTED_METHODS = (
+	'start_task', 'stop_task', 'import_tasks', 'import_file', 'export_file', 'export_tasks',
+	'get_running_task', 'get_task', 'get_all_tasks', 'get_tasks_page', 'search_tasks', 'get_tasks_by_date_range',
+	'get_summary', 'get_breakdown', 'get_task_columns', 'update_task', 'delete_task', 'delete_tasks', 'retag_tasks', 'rename_tasks', 'get_all_tags', 'get_tag_stats',
+	'get_setting', 'set_setting', 'rebuild_daily_totals', 'verify_daily_totals',
+)
+
+# Task ids touched by a committed mutation, passed to subscribers. ``reset``
+# marks bulk changes (such as imports) that subscribers should reload for.
+Change = namedtuple('Change', ['inserted', 'updated', 'deleted', 'reset'], defaults=(False,))
+
+
+class TaskAlreadyRunning(Exception):
+	"""Raised when starting a task while another one is running"""
+
+	def __init__(self, task_id, name):
+		super().__init__(f"'{name}' is already running")
+		self.task_id = task_id
+		self.name = name
+
+
+def retry_busy(method):
+	"""Retry a write method with exponential backoff while the database is locked
+
+	busy_timeout already makes SQLite wait for the lock; this covers writers
+	that hold it for longer, and transactions that must restart because
+	another connection committed first. The method must do all its writing
+	in one transaction, so a failed attempt leaves nothing behind.
+	"""
+	@functools.wraps(method)
+	def wrapper(*args, **kwargs):
+		for attempt in range(BUSY_RETRIES):
+			try:
+				return method(*args, **kwargs)
+			except sqlite3.OperationalError as e:
+				if "locked" not in str(e) or attempt == BUSY_RETRIES - 1:
+					raise
+			# Jitter keeps competing processes from retrying in lockstep
+			time.sleep(BUSY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+	return wrapper
+
+
+def parse_tags(tags):
+	"""Split a comma-separated tag string into unique, stripped tag names"""
+	seen = []
+	for tag in (tags or "").split(','):
+		tag = tag.strip()
+		if tag and tag not in seen:
+			seen.append(tag)
+	return seen
+
+
+def parse_timestamp(value):
+	"""Parse an ISO timestamp; values without an offset are local time"""
+	return datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+
+
+def to_epoch(moment):
+	"""Return (UTC epoch seconds, UTC offset in seconds) for a datetime or epoch time
+
+	Naive datetimes are taken as local time, and epoch times get the local
+	offset at that instant.
+	"""
+	if isinstance(moment, (int, float)):
+		moment = datetime.fromtimestamp(moment)
+	if moment.tzinfo is None:
+		moment = moment.astimezone()
+	return int(moment.timestamp()), int(moment.utcoffset().total_seconds())
+
+
+def from_epoch(epoch, tz_offset):
+	"""Return a stored time as an aware datetime in the offset it was recorded with"""
+	return datetime.fromtimestamp(epoch, timezone(timedelta(seconds=tz_offset)))
+
+
+def read_csv(source):
+	"""Yield task dicts from a CSV file with name, tags, start, end columns"""
+	reader = csv.reader(source)
+	header = next(reader, [])
+	if header:
+		# Also a byte-order mark, should a saved spreadsheet arrive on stdin
+		header[0] = header[0].lstrip('\ufeff')
+	columns = [(i, IMPORT_FIELDS[h.strip().lower()]) for i, h in enumerate(header)
+		if h.strip().lower() in IMPORT_FIELDS]
+	for row in reader:
+		if row:
+			yield {field: row[i] for i, field in columns if i < len(row)}
+
+
+def read_jsonl(source):
+	"""Yield task dicts from a JSON-lines file"""
+	for line in source:
+		line = line.strip()
+		if line:
+			record = json.loads(line)
+			yield {IMPORT_FIELDS[k.lower()]: v for k, v in record.items() if k.lower() in IMPORT_FIELDS}
+
+
+def fts_query(text):
+	"""Turn free text into an FTS5 query matching every word as a prefix
+
+	Returns None if the text has no searchable words. Words are quoted, so
+	FTS5 operators typed by the user are matched literally.
+	"""
+	words = re.findall(r"\w+", text or "")
+	if not words:
+		return None
+	return " ".join(f'"{word}"*' for word in words)
+
+
+def fts5_available(conn):
+	"""Return True if the SQLite library was built with FTS5"""
+	return bool(conn.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+
+
+def decode_report(payload):
+	"""Load a report stored as JSON, turning its lists of pairs back into tuples"""
+	report = json.loads(payload)
+	return {
+		key: [tuple(pair) for pair in value] if isinstance(value, list) else value
+		for key, value in report.items()
+	}
+
+
+def day_range(start_date, end_date):
+	"""Return half-open epoch bounds covering whole local days from start_date to end_date
+
+	``start_ts >= lo AND start_ts < hi`` selects tasks that started on those
+	days in the current time zone, using the start_ts index.
+	"""
+	start = datetime.fromisoformat(str(start_date))
+	end = datetime.fromisoformat(str(end_date)) + timedelta(days=1)
+	return int(start.timestamp()), int(end.timestamp())
+
 
 class Database:
-	"""SQLite database handler"""
-	
-	def __init__(self, db_file="timepunch.db"):
+	"""SQLite database handler
+
+	Connections are opened lazily, one per thread, and kept for the lifetime
+	of the handler instead of being reopened for every call. Use ``close()``
+	or a ``with`` block to release them.
+
+	Pass a QueryMetrics (or call ``enable_metrics()``) to record call
+	counts, latencies and the SQL behind each public method.
+	"""
+
+	def __init__(self, db_file="timepunch.db", metrics=None):
 		self.db_file = db_file
+		self._local = threading.local()
+		self._connections = []
+		self._lock = threading.Lock()
+		self._subscribers = []
+		self._write_queue = None
+		self._version_conn = None
+		# (kind, start day, end day) -> (data version, summary_cache row id, report)
+		self._reports = OrderedDict()
+		self.report_cache_stats = {'hits': 0, 'stored_hits': 0, 'misses': 0}
+		self.metrics = None
+		self.fts = None  # whether full-text search is available, set by init_db
+		if metrics is not None:
+			self.enable_metrics(metrics)
 		self.init_db()
-	
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc, tb):
+		self.close()
+
+	def connection(self):
+		"""Return this thread's connection, opening it on first use"""
+		conn = getattr(self._local, "conn", None)
+		if conn is None:
+			conn = sqlite3.connect(self.db_file, check_same_thread=False)
+			for name, value in PRAGMAS:
+				conn.execute(f"PRAGMA {name} = {value}")
+			if self.metrics is not None:
+				conn.set_trace_callback(self.metrics.trace)
+			self._local.conn = conn
+			with self._lock:
+				self._connections.append(conn)
+		return conn
+
+	def close(self):
+		"""Close every connection opened by this handler, flushing queued writes first"""
+		if self._write_queue is not None:
+			self._write_queue.close()
+			self._write_queue = None
+		with self._lock:
+			connections, self._connections = self._connections, []
+			if self._version_conn is not None:
+				connections.append(self._version_conn)
+				self._version_conn = None
+			self._reports.clear()
+		for conn in connections:
+			conn.close()
+		self._local = threading.local()
+
+	def enable_metrics(self, metrics=None):
+		"""Start recording query metrics and return the QueryMetrics in use
+
+		Instrumentation is opt-in: until this is called the methods run
+		unwrapped and no trace callback is installed.
+		"""
+		if self.metrics is not None:
+			return self.metrics
+		self.metrics = metrics or QueryMetrics()
+		for name in INSTRUMENTED_METHODS:
+			setattr(self, name, self._instrumented(name, getattr(self, name)))
+		with self._lock:
+			for conn in self._connections:
+				conn.set_trace_callback(self.metrics.trace)
+		return self.metrics
+
+	def _instrumented(self, name, method):
+		"""Wrap a bound method so each call is recorded in self.metrics"""
+		metrics = self.metrics
+
+		@functools.wraps(method)
+		def wrapper(*args, **kwargs):
+			with metrics.track(name) as call:
+				result = method(*args, **kwargs)
+				call['rows'] = count_rows(result)
+			return result
+		return wrapper
+
+	def write_queue(self, **options):
+		"""Return this handler's WriteQueue for grouped writes, starting it on first use
+
+		``options`` go to WriteQueue when it is created. close() flushes it.
+		"""
+		# Imported here as the queue module builds on this one
+		from writequeue import WriteQueue
+		with self._lock:
+			if self._write_queue is None:
+				self._write_queue = WriteQueue(self, **options)
+			return self._write_queue
+
+	def subscribe(self, callback):
+		"""Call ``callback(change)`` with a Change after every committed task mutation"""
+		self._subscribers.append(callback)
+
+	def unsubscribe(self, callback):
+		"""Stop notifying a subscriber"""
+		self._subscribers.remove(callback)
+
+	def _notify(self, inserted=(), updated=(), deleted=(), reset=False):
+		"""Report changed task ids to subscribers"""
+		change = Change(tuple(inserted), tuple(updated), tuple(deleted), reset)
+		for callback in list(self._subscribers):
+			callback(change)
+
+	def data_version(self):
+		"""Return a number that changes whenever the database is modified
+
+		This is ``PRAGMA data_version`` on a connection that never writes, so
+		it sees commits from every other connection, in this process or not.
+		"""
+		with self._lock:
+			if self._version_conn is None:
+				self._version_conn = sqlite3.connect(self.db_file, check_same_thread=False)
+			return self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+	@contextmanager
+	def _transaction(self, immediate=False):
+		"""Yield a cursor inside a transaction, committing on success
+
+		``immediate`` takes the write lock up front, for transactions that
+		read state they are about to write back.
+		"""
+		conn = self.connection()
+		with conn:
+			if immediate:
+				conn.execute("BEGIN IMMEDIATE")
+			yield conn.cursor()
+
 	def init_db(self):
-		"""Initialize database with tables"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		
+		"""Create the schema, or upgrade it to SCHEMA_VERSION"""
+		conn = self.connection()
+		# Opening an up-to-date database should not need a write transaction
+		if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+			self._migrate()
+		self.fts = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'").fetchone() is not None
+
+	def _migrate(self):
+		"""Run every pending migration in one transaction
+
+		Foreign keys are off meanwhile so tables can be rebuilt without
+		cascading deletes; they are checked before committing instead.
+		"""
+		conn = self.connection()
+		conn.execute("PRAGMA foreign_keys = OFF")
+		try:
+			with self._transaction(immediate=True) as cursor:
+				# Read again under the write lock in case another process just migrated
+				version = cursor.execute("PRAGMA user_version").fetchone()[0]
+				for migration in self.MIGRATIONS[version:]:
+					migration(self, cursor)
+				if cursor.execute("PRAGMA foreign_key_check").fetchone():
+					raise sqlite3.IntegrityError("Migration left dangling foreign keys")
+				cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+		finally:
+			conn.execute("PRAGMA foreign_keys = ON")
+
+	def _migrate_baseline(self, cursor):
+		"""Version 1: the unversioned schema, with ISO text times
+
+		Also brings databases from before the tags, rollup and search tables
+		up to date.
+		"""
+		cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'task_tags'")
+		has_tag_tables = cursor.fetchone() is not None
+
 		cursor.execute("""
 			CREATE TABLE IF NOT EXISTS tasks (
 				id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -30,139 +439,879 @@ class Database:
 				is_running INTEGER DEFAULT 0
 			)
 		""")
-		
+		cursor.execute("DROP INDEX IF EXISTS idx_tasks_start")
+
 		cursor.execute("""
 			CREATE TABLE IF NOT EXISTS settings (
 				key TEXT PRIMARY KEY,
 				value TEXT
 			)
 		""")
-		
-		conn.commit()
-		conn.close()
-	
-	def start_task(self, name, tags=""):
-		"""Start a new task"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		
-		start_time = datetime.now().isoformat()
+
+		# Normalized tags; tasks.tags keeps the text as entered for display
+		cursor.execute("""
+			CREATE TABLE IF NOT EXISTS tags (
+				id INTEGER PRIMARY KEY,
+				name TEXT NOT NULL UNIQUE
+			)
+		""")
+
+		cursor.execute("""
+			CREATE TABLE IF NOT EXISTS task_tags (
+				task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+				tag_id INTEGER NOT NULL REFERENCES tags(id),
+				PRIMARY KEY (task_id, tag_id)
+			) WITHOUT ROWID
+		""")
+		cursor.execute("CREATE INDEX IF NOT EXISTS idx_task_tags_tag ON task_tags (tag_id, task_id)")
+
+		# Completed time per day x task x tag, maintained incrementally
+		# (filled by the epoch migration, which changes how days are derived)
+		cursor.execute("""
+			CREATE TABLE IF NOT EXISTS daily_totals (
+				day TEXT NOT NULL,
+				name TEXT NOT NULL,
+				tag TEXT NOT NULL,
+				seconds INTEGER NOT NULL,
+				task_count INTEGER NOT NULL,
+				PRIMARY KEY (day, name, tag)
+			) WITHOUT ROWID
+		""")
+
+		if fts5_available(cursor.connection):
+			self._create_fts(cursor)
+
+		if not has_tag_tables:
+			self._migrate_tags(cursor)
+
+	def _migrate_epoch_times(self, cursor):
+		"""Version 2: store times as integer UTC epoch seconds plus the local UTC offset
+
+		SQLite cannot change a column's type, so tasks is rebuilt. The old
+		naive local times are converted with the current time zone rules.
+		"""
+		cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tasks'")
+		row = cursor.fetchone()
+		sequence = row[0] if row else 0
+
+		cursor.execute("""
+			CREATE TABLE tasks_v2 (
+				id INTEGER PRIMARY KEY AUTOINCREMENT,
+				name TEXT NOT NULL,
+				tags TEXT,
+				start_ts INTEGER NOT NULL,
+				end_ts INTEGER,
+				duration_seconds INTEGER,
+				is_running INTEGER DEFAULT 0,
+				tz_offset INTEGER NOT NULL DEFAULT 0
+			)
+		""")
+		cursor.execute("""
+			INSERT INTO tasks_v2 (id, name, tags, start_ts, end_ts, duration_seconds, is_running, tz_offset)
+			SELECT id, name, tags,
+				CAST(strftime('%s', start_time, 'utc') AS INTEGER),
+				CAST(strftime('%s', end_time, 'utc') AS INTEGER),
+				duration_seconds, is_running,
+				CAST(strftime('%s', start_time) AS INTEGER) - CAST(strftime('%s', start_time, 'utc') AS INTEGER)
+			FROM tasks
+		""")
+		# Dropping tasks also drops its indexes and the search triggers
+		cursor.execute("DROP TABLE tasks")
+		cursor.execute("ALTER TABLE tasks_v2 RENAME TO tasks")
 		cursor.execute(
-			"INSERT INTO tasks (name, tags, start_time, is_running) VALUES (?, ?, ?, 1)",
-			(name, tags, start_time)
+			"UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'tasks'", (sequence,)
 		)
-		task_id = cursor.lastrowid
-		
-		conn.commit()
-		conn.close()
+
+		# (start_ts, id) is the history sort key and the pagination cursor
+		cursor.execute("CREATE INDEX idx_tasks_start_id ON tasks (start_ts, id)")
+		cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")
+		if cursor.fetchone():
+			for sql in FTS_TRIGGERS.values():
+				cursor.execute(sql)
+		self._rebuild_daily_totals(cursor)
+
+	def _migrate_summary_cache(self, cursor):
+		"""Version 3: persist report results for date ranges
+
+		Every change to daily_totals drops the rows whose range covers a
+		changed day (see _invalidate_reports), so a cached report stays valid
+		until its data changes.
+		"""
+		cursor.execute("""
+			CREATE TABLE summary_cache (
+				id INTEGER PRIMARY KEY AUTOINCREMENT,
+				kind TEXT NOT NULL,
+				start_day TEXT NOT NULL,
+				end_day TEXT NOT NULL,
+				payload TEXT NOT NULL,
+				UNIQUE (kind, start_day, end_day)
+			)
+		""")
+
+	def _migrate_single_running(self, cursor):
+		"""Version 4: allow at most one running task
+
+		Processes racing to start a task could leave several running. Each
+		is stopped when the next one was started, as if it had been switched,
+		before a partial unique index rules out more.
+		"""
+		running = cursor.execute(
+			"SELECT id, start_ts FROM tasks WHERE is_running = 1 ORDER BY start_ts, id"
+		).fetchall()
+		for (task_id, _), (_, next_start) in zip(running, running[1:]):
+			self._stop(cursor, task_id, next_start)
+		cursor.execute("CREATE UNIQUE INDEX idx_tasks_running ON tasks (is_running) WHERE is_running = 1")
+
+	# Schema upgrades in order: MIGRATIONS[n] takes a database from version n to n + 1
+	MIGRATIONS = (_migrate_baseline, _migrate_epoch_times, _migrate_summary_cache, _migrate_single_running)
+
+	def _create_fts(self, cursor):
+		"""Create the tasks_fts index and its triggers, indexing existing tasks"""
+		cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'tasks_fts'")
+		is_new = cursor.fetchone() is None
+
+		# External content: the index stores no copy of the text, only the postings
+		cursor.execute("""
+			CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5(
+				name, tags,
+				content='tasks', content_rowid='id',
+				tokenize='unicode61 remove_diacritics 2',
+				prefix='2 3'
+			)
+		""")
+		for sql in FTS_TRIGGERS.values():
+			cursor.execute(sql)
+		if is_new:
+			cursor.execute("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+	def _migrate_tags(self, cursor):
+		"""Populate task_tags from the legacy comma-separated tasks.tags column"""
+		rows = cursor.execute(
+			"SELECT id, tags FROM tasks WHERE tags IS NOT NULL AND tags != ''"
+		).fetchall()
+		for task_id, tags in rows:
+			self._set_task_tags(cursor, task_id, tags)
+
+	def _set_task_tags(self, cursor, task_id, tags):
+		"""Replace the task_tags rows for a task"""
+		cursor.execute("DELETE FROM task_tags WHERE task_id = ?", (task_id,))
+		names = parse_tags(tags)
+		if not names:
+			return
+		cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names])
+		cursor.executemany(
+			"INSERT INTO task_tags (task_id, tag_id) SELECT ?, id FROM tags WHERE name = ?",
+			[(task_id, n) for n in names]
+		)
+
+	def _rollup(self, cursor, task_id, sign):
+		"""Add (sign=1) or remove (sign=-1) a completed task's time in daily_totals"""
+		cursor.execute(
+			f"SELECT name, tags, {LOCAL_DAY}, end_ts, duration_seconds FROM tasks WHERE id = ?",
+			(task_id,)
+		)
+		row = cursor.fetchone()
+		if not row or row[3] is None:
+			return
+
+		name, tags, day, _, duration = row
+		seconds = sign * (duration or 0)
+		self._invalidate_reports(cursor, day, day)
+		cursor.executemany("""
+			INSERT INTO daily_totals (day, name, tag, seconds, task_count) VALUES (?, ?, ?, ?, ?)
+			ON CONFLICT (day, name, tag) DO UPDATE SET
+				seconds = seconds + excluded.seconds,
+				task_count = task_count + excluded.task_count
+		""", [(day, name, tag, seconds, sign) for tag in [''] + parse_tags(tags)])
+		cursor.execute(
+			"DELETE FROM daily_totals WHERE day = ? AND name = ? AND task_count <= 0",
+			(day, name)
+		)
+
+	def _invalidate_reports(self, cursor, first_day, last_day):
+		"""Drop the cached reports whose range overlaps days first..last"""
+		cursor.execute(
+			"DELETE FROM summary_cache WHERE start_day <= ? AND end_day >= ?", (last_day, first_day)
+		)
+
+	def _stage_ids(self, cursor, task_ids):
+		"""Load task ids into temp.batch_ids so batch statements can work set-based"""
+		cursor.execute("CREATE TEMP TABLE IF NOT EXISTS batch_ids (id INTEGER PRIMARY KEY)")
+		cursor.execute("DELETE FROM temp.batch_ids")
+		cursor.executemany("INSERT OR IGNORE INTO temp.batch_ids (id) VALUES (?)", [(i,) for i in task_ids])
+
+	def _rollup_batch(self, cursor, sign):
+		"""Add (sign=1) or remove (sign=-1) the staged tasks' time in daily_totals"""
+		cursor.execute("""
+			DELETE FROM summary_cache WHERE EXISTS (
+				SELECT 1 FROM tasks
+				WHERE id IN (SELECT id FROM temp.batch_ids) AND end_ts IS NOT NULL
+					AND date(start_ts + tz_offset, 'unixepoch') BETWEEN start_day AND end_day
+			)
+		""")
+		cursor.execute(f"""
+			INSERT INTO daily_totals (day, name, tag, seconds, task_count)
+			SELECT day, name, tag, ? * seconds, ? * task_count FROM ({ROLLUP_SQL.format(where=ROLLUP_BATCH)}) WHERE true
+			ON CONFLICT (day, name, tag) DO UPDATE SET
+				seconds = seconds + excluded.seconds,
+				task_count = task_count + excluded.task_count
+		""", (sign, sign))
+		if sign < 0:
+			cursor.execute("""
+				DELETE FROM daily_totals WHERE task_count <= 0 AND day IN (
+					SELECT DISTINCT date(start_ts + tz_offset, 'unixepoch') FROM tasks
+					WHERE id IN (SELECT id FROM temp.batch_ids)
+				)
+			""")
+
+	def _rebuild_daily_totals(self, cursor):
+		"""Recompute daily_totals from the tasks table"""
+		cursor.execute("DELETE FROM daily_totals")
+		cursor.execute(f"INSERT INTO daily_totals (day, name, tag, seconds, task_count) {ROLLUP_SQL.format(where='')}")
+
+	def _rebuild_daily_totals_range(self, cursor, first_day, last_day):
+		"""Recompute daily_totals for an inclusive range of days"""
+		lo, hi = day_range(first_day, last_day)
+		params = (lo - 86400, hi + 86400, first_day, last_day)
+		self._invalidate_reports(cursor, first_day, last_day)
+		cursor.execute("DELETE FROM daily_totals WHERE day BETWEEN ? AND ?", (first_day, last_day))
+		cursor.execute(
+			f"INSERT INTO daily_totals (day, name, tag, seconds, task_count) {ROLLUP_SQL.format(where=ROLLUP_RANGE)}",
+			params + params
+		)
+
+	@retry_busy
+	def rebuild_daily_totals(self):
+		"""Rebuild the daily_totals rollup from scratch"""
+		with self._transaction() as cursor:
+			cursor.execute("DELETE FROM summary_cache")
+			self._rebuild_daily_totals(cursor)
+
+	@retry_busy
+	def clear_summary_cache(self):
+		"""Drop every cached report, in memory and in the database"""
+		with self._transaction() as cursor:
+			cursor.execute("DELETE FROM summary_cache")
+		with self._lock:
+			self._reports.clear()
+
+	def verify_daily_totals(self):
+		"""Compare daily_totals with the raw tasks
+
+		Returns a list of (day, name, tag, expected, actual) tuples, where
+		expected/actual are (seconds, task_count) or None. An empty list
+		means the rollup is consistent.
+		"""
+		conn = self.connection()
+		expected = {row[:3]: row[3:] for row in conn.execute(ROLLUP_SQL.format(where=''))}
+		actual = {
+			row[:3]: row[3:]
+			for row in conn.execute("SELECT day, name, tag, seconds, task_count FROM daily_totals")
+		}
+		return [
+			key + (expected.get(key), actual.get(key))
+			for key in sorted(expected.keys() | actual.keys())
+			if expected.get(key) != actual.get(key)
+		]
+
+	@retry_busy
+	def start_task(self, name, tags="", switch=False):
+		"""Start a new task, returning its id
+
+		Raises TaskAlreadyRunning if a task is running, unless ``switch`` is
+		set, in which case that task is stopped in the same transaction.
+		"""
+		with self._transaction(immediate=True) as cursor:
+			task_id, stopped = self._start(cursor, name, tags, switch, datetime.now())
+		self._notify(inserted=[task_id], updated=[stopped] if stopped else ())
 		return task_id
-	
+
+	def _start(self, cursor, name, tags, switch, moment):
+		"""Insert a task running since ``moment``; return (its id, id of the task it stopped or None)"""
+		start_ts, tz_offset = to_epoch(moment)
+		stopped = None
+		running = cursor.execute("SELECT id, name FROM tasks WHERE is_running = 1").fetchone()
+		if running is not None:
+			if not switch:
+				raise TaskAlreadyRunning(*running)
+			stopped = running[0]
+			self._stop(cursor, stopped, start_ts)
+		cursor.execute(
+			"INSERT INTO tasks (name, tags, start_ts, tz_offset, is_running) VALUES (?, ?, ?, ?, 1)",
+			(name, tags, start_ts, tz_offset)
+		)
+		task_id = cursor.lastrowid
+		self._set_task_tags(cursor, task_id, tags)
+		return task_id, stopped
+
+	@retry_busy
 	def stop_task(self, task_id):
-		"""Stop a running task"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		
-		end_time = datetime.now().isoformat()
-		cursor.execute("SELECT start_time FROM tasks WHERE id = ?", (task_id,))
-		result = cursor.fetchone()
-		
-		if result:
-			start = datetime.fromisoformat(result[0])
-			end = datetime.fromisoformat(end_time)
-			duration = int((end - start).total_seconds())
-			
-			cursor.execute(
-				"UPDATE tasks SET end_time = ?, duration_seconds = ?, is_running = 0 WHERE id = ?",
-				(end_time, duration, task_id)
-			)
-		
-		conn.commit()
-		conn.close()
-	
+		"""Stop a running task, returning False if it was not running"""
+		with self._transaction(immediate=True) as cursor:
+			stopped = self._stop(cursor, task_id, to_epoch(datetime.now())[0])
+		if stopped:
+			self._notify(updated=[task_id])
+		return stopped
+
+	def _stop(self, cursor, task_id, end_ts):
+		"""End a running task at ``end_ts`` and add it to daily_totals
+
+		A task never ends before it started, should clocks or queued events
+		disagree slightly.
+		"""
+		cursor.execute(
+			"UPDATE tasks SET end_ts = MAX(?, start_ts), duration_seconds = MAX(?, start_ts) - start_ts, "
+			"is_running = 0 WHERE id = ? AND is_running = 1",
+			(end_ts, end_ts, task_id)
+		)
+		if not cursor.rowcount:
+			return False
+		self._rollup(cursor, task_id, 1)
+		return True
+
+	def import_tasks(self, records, skip_duplicates=False, batch_size=5000):
+		"""Bulk insert completed tasks in a single transaction
+
+		``records`` is any iterable of dicts with ``name``, ``start``, ``end``
+		and optional ``tags``; it is consumed lazily and written with
+		executemany in batches. With ``skip_duplicates``, records whose name
+		and start time already exist (in the database or earlier in the
+		input) are skipped. Returns a dict with ``imported`` and ``skipped``
+		counts. Raises ValueError naming the offending record on bad input.
+		"""
+		imported = skipped = 0
+		seen = set()
+		tag_ids = {}
+		first_day = last_day = None
+
+		with self._transaction(immediate=True) as cursor:
+			# Ids are assigned here so task_tags can be written with executemany too
+			next_id = first_id = cursor.execute(
+				"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'tasks'), 0), "
+				"COALESCE((SELECT MAX(id) FROM tasks), 0))"
+			).fetchone()[0] + 1
+			# Index the new rows in one statement at the end instead of row by row
+			if self.fts:
+				cursor.execute("DROP TRIGGER IF EXISTS tasks_fts_insert")
+
+			tasks, links = [], []
+			for number, record in enumerate(records, 1):
+				try:
+					name = str(record['name']).strip()
+					start = parse_timestamp(record['start'])
+					end = parse_timestamp(record['end'])
+				except (KeyError, TypeError, ValueError) as e:
+					raise ValueError(f"Record {number}: {e!r}") from e
+				if not name:
+					raise ValueError(f"Record {number}: empty task name")
+
+				start_ts, tz_offset = to_epoch(start)
+				end_ts = to_epoch(end)[0]
+				if end_ts < start_ts:
+					raise ValueError(f"Record {number}: end before start")
+				if skip_duplicates:
+					key = (name, start_ts)
+					if key in seen or cursor.execute(
+						"SELECT 1 FROM tasks WHERE start_ts = ? AND name = ?", (start_ts, name)
+					).fetchone():
+						skipped += 1
+						continue
+					seen.add(key)
+
+				names = parse_tags(record.get('tags'))
+				tasks.append((
+					next_id, name, ", ".join(names), start_ts, end_ts, end_ts - start_ts, tz_offset
+				))
+				links.extend((next_id, tag) for tag in names)
+				next_id += 1
+
+				# The day in the offset the task was recorded with, as LOCAL_DAY computes it
+				day = start.date().isoformat()
+				first_day = day if first_day is None else min(first_day, day)
+				last_day = day if last_day is None else max(last_day, day)
+
+				if len(tasks) >= batch_size:
+					imported += self._insert_batch(cursor, tasks, links, tag_ids)
+					tasks, links = [], []
+			imported += self._insert_batch(cursor, tasks, links, tag_ids)
+
+			if imported:
+				self._rebuild_daily_totals_range(cursor, first_day, last_day)
+			if self.fts:
+				cursor.execute(
+					"INSERT INTO tasks_fts (rowid, name, tags) SELECT id, name, tags FROM tasks WHERE id >= ?",
+					(first_id,)
+				)
+				cursor.execute(FTS_TRIGGERS['tasks_fts_insert'])
+
+		if imported:
+			self._notify(reset=True)
+		return {'imported': imported, 'skipped': skipped}
+
+	def _insert_batch(self, cursor, tasks, links, tag_ids):
+		"""Write one batch of imported tasks and their tag links"""
+		if not tasks:
+			return 0
+		cursor.executemany(
+			"INSERT INTO tasks (id, name, tags, start_ts, end_ts, duration_seconds, tz_offset, is_running) "
+			"VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+			tasks
+		)
+		new_tags = {tag for _, tag in links if tag not in tag_ids}
+		if new_tags:
+			cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(t,) for t in new_tags])
+			for tag in new_tags:
+				tag_ids[tag] = cursor.execute("SELECT id FROM tags WHERE name = ?", (tag,)).fetchone()[0]
+		cursor.executemany(
+			"INSERT INTO task_tags (task_id, tag_id) VALUES (?, ?)",
+			[(task_id, tag_ids[tag]) for task_id, tag in links]
+		)
+		return len(tasks)
+
+	def import_file(self, path, fmt=None, **options):
+		"""Import a CSV or JSON-lines file ('-' reads stdin)
+
+		The format is taken from ``fmt`` or the file extension (.csv,
+		.jsonl/.ndjson). Other keyword arguments go to import_tasks().
+		"""
+		fmt = fmt or ('jsonl' if str(path).lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+		reader = read_jsonl if fmt == 'jsonl' else read_csv
+		if str(path) == '-':
+			return self.import_tasks(reader(sys.stdin), **options)
+		# utf-8-sig drops the byte-order mark spreadsheets put before "CSV UTF-8"
+		with open(path, newline='', encoding='utf-8-sig') as source:
+			return self.import_tasks(reader(source), **options)
+
+	def export_file(self, path, fmt=None, **filters):
+		"""Export tasks to a file, choosing CSV or JSON lines by ``fmt`` or extension"""
+		fmt = fmt or ('jsonl' if str(path).lower().endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+		with open(path, 'w', newline='', encoding='utf-8') as out:
+			return self.export_tasks(out, fmt, **filters)
+
 	def get_running_task(self):
-		"""Get currently running task"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		cursor.execute("SELECT * FROM tasks WHERE is_running = 1 ORDER BY start_time DESC LIMIT 1")
-		result = cursor.fetchone()
-		conn.close()
-		return result
-	
-	def get_all_tasks(self, limit=100):
+		"""Get currently running task (idx_tasks_running allows at most one)"""
+		cursor = self.connection().execute("SELECT * FROM tasks WHERE is_running = 1")
+		return cursor.fetchone()
+
+	def get_task(self, task_id):
+		"""Get a single task by id"""
+		cursor = self.connection().execute("SELECT * FROM tasks WHERE id = ?", (task_id,))
+		return cursor.fetchone()
+
+	def get_all_tasks(self, limit=100, offset=0):
 		"""Get all tasks ordered by start time descending"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		cursor.execute("SELECT * FROM tasks ORDER BY start_time DESC LIMIT ?", (limit,))
-		results = cursor.fetchall()
-		conn.close()
-		return results
-	
+		cursor = self.connection().execute(
+			"SELECT * FROM tasks ORDER BY start_ts DESC, id DESC LIMIT ? OFFSET ?", (limit, offset)
+		)
+		return cursor.fetchall()
+
+	def get_tasks_page(self, limit=100, after=None, before=None, name=None, tag=None,
+			start_date=None, end_date=None):
+		"""Get one page of tasks ordered by (start_ts, id) descending
+
+		``after`` and ``before`` are (start_ts, id) cursors taken from the
+		last or first row of a previous page: ``after`` returns the next
+		(older) page and ``before`` the previous (newer) one. Paging uses the
+		(start_ts, id) index, so page N costs the same as page 1. Results
+		can be filtered by exact task name, tag and an inclusive date range.
+		"""
+		clauses, params = self._task_filters(name, tag, start_date, end_date)
+		if after is not None:
+			clauses.append("(start_ts, id) < (?, ?)")
+			params.extend(after)
+		if before is not None:
+			clauses.append("(start_ts, id) > (?, ?)")
+			params.extend(before)
+
+		where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+		# Walking backwards reads ascending from the cursor, then flips the page
+		order = "ASC" if before is not None and after is None else "DESC"
+		cursor = self.connection().execute(
+			f"SELECT * FROM tasks {where} ORDER BY start_ts {order}, id {order} LIMIT ?",
+			params + [limit]
+		)
+		rows = cursor.fetchall()
+		if order == "ASC":
+			rows.reverse()
+		return rows
+
+	def search_tasks(self, text, limit=100, offset=0):
+		"""Get one page of tasks whose name or tags contain every word of ``text``
+
+		Words match as prefixes ("rev" finds "review"). With FTS5, up to
+		FTS_RANK_LIMIT matches are ranked by bm25 relevance; broader
+		searches are listed newest first (by id), which needs no sort.
+		Ranking needs every match, so pages use OFFSET rather than a
+		cursor. Without FTS5 this falls back to LIKE scans, newest first.
+		"""
+		query = fts_query(text)
+		if query is None:
+			return []
+		if self.fts:
+			conn = self.connection()
+			matches = conn.execute(
+				"SELECT COUNT(*) FROM (SELECT 1 FROM tasks_fts WHERE tasks_fts MATCH ? LIMIT ?)",
+				(query, FTS_RANK_LIMIT + 1)
+			).fetchone()[0]
+			order = f"{FTS_RANK}, tasks.id DESC" if matches <= FTS_RANK_LIMIT else "tasks_fts.rowid DESC"
+			cursor = conn.execute(f"""
+				SELECT tasks.* FROM tasks_fts
+				JOIN tasks ON tasks.id = tasks_fts.rowid
+				WHERE tasks_fts MATCH ?
+				ORDER BY {order}
+				LIMIT ? OFFSET ?
+			""", (query, limit, offset))
+			return cursor.fetchall()
+
+		words = re.findall(r"\w+", text)
+		clauses = " AND ".join("(name LIKE ? OR tags LIKE ?)" for _ in words)
+		params = [f"%{word}%" for word in words for _ in range(2)]
+		cursor = self.connection().execute(
+			f"SELECT * FROM tasks WHERE {clauses} ORDER BY start_ts DESC, id DESC LIMIT ? OFFSET ?",
+			params + [limit, offset]
+		)
+		return cursor.fetchall()
+
+	def _task_filters(self, name=None, tag=None, start_date=None, end_date=None):
+		"""Build WHERE clauses and parameters for the common task filters"""
+		clauses = []
+		params = []
+		if name is not None:
+			clauses.append("name = ?")
+			params.append(name)
+		if tag is not None:
+			clauses.append(
+				"EXISTS (SELECT 1 FROM task_tags JOIN tags ON tags.id = task_tags.tag_id "
+				"WHERE task_tags.task_id = tasks.id AND tags.name = ?)"
+			)
+			params.append(tag)
+		if start_date is not None:
+			clauses.append("start_ts >= ?")
+			params.append(day_range(start_date, start_date)[0])
+		if end_date is not None:
+			clauses.append("start_ts < ?")
+			params.append(day_range(end_date, end_date)[1])
+		return clauses, params
+
+	def iter_tasks(self, name=None, tag=None, start_date=None, end_date=None, running=True, batch_size=1000):
+		"""Yield task rows oldest first, reading ``batch_size`` rows at a time
+
+		Without ``running``, the running task (which has no end) is left out.
+		"""
+		clauses, params = self._task_filters(name, tag, start_date, end_date)
+		if not running:
+			clauses.append("end_ts IS NOT NULL")
+		where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+		cursor = self.connection().execute(
+			f"SELECT * FROM tasks {where} ORDER BY start_ts, id", params
+		)
+		while True:
+			rows = cursor.fetchmany(batch_size)
+			if not rows:
+				return
+			yield from rows
+
+	def export_tasks(self, out, fmt='csv', running=False, **filters):
+		"""Write tasks to a text stream as CSV or JSON lines, returning the row count
+
+		Rows are streamed from iter_tasks(), so memory use does not depend
+		on the number of tasks. Filters are passed to iter_tasks(). The
+		running task is only written with ``running``, as it has no end and
+		so cannot be imported; the name, tags, start and end fields of every
+		other task can be imported again.
+		"""
+		count = 0
+		writer = None
+		if fmt != 'jsonl':
+			writer = csv.writer(out)
+			writer.writerow(EXPORT_FIELDS)
+		for task in self.iter_tasks(running=running, **filters):
+			row = (
+				task[0], task[1], task[2], from_epoch(task[3], task[7]).isoformat(),
+				from_epoch(task[4], task[7]).isoformat() if task[4] is not None else None,
+				task[5]
+			)
+			if writer is None:
+				out.write(json.dumps(dict(zip(EXPORT_FIELDS, row))) + "\n")
+			else:
+				writer.writerow(row)
+			count += 1
+		return count
+
 	def get_tasks_by_date_range(self, start_date, end_date):
 		"""Get tasks within date range"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		cursor.execute(
-			"SELECT * FROM tasks WHERE date(start_time) BETWEEN ? AND ? ORDER BY start_time DESC",
-			(start_date, end_date)
+		cursor = self.connection().execute(
+			"SELECT * FROM tasks WHERE start_ts >= ? AND start_ts < ? ORDER BY start_ts DESC",
+			day_range(start_date, end_date)
 		)
-		results = cursor.fetchall()
-		conn.close()
-		return results
-	
-	def update_task(self, task_id, name, tags, start_time, end_time):
-		"""Update an existing task"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		
-		start = datetime.fromisoformat(start_time)
-		end = datetime.fromisoformat(end_time)
-		duration = int((end - start).total_seconds())
-		
-		cursor.execute(
-			"UPDATE tasks SET name = ?, tags = ?, start_time = ?, end_time = ?, duration_seconds = ? WHERE id = ?",
-			(name, tags, start_time, end_time, duration, task_id)
-		)
-		
-		conn.commit()
-		conn.close()
-	
+		return cursor.fetchall()
+
+	def _cached_report(self, kind, start_date, end_date, compute):
+		"""Return ``compute(start_date, end_date)``, cached per (kind, range)
+
+		Reports are kept in an in-memory LRU and in the summary_cache table,
+		whose rows are dropped when a day in their range changes.
+		A memory entry is used as is while data_version() is unchanged, and
+		otherwise only if its summary_cache row is still there. Results are
+		shared between callers and must not be modified.
+		"""
+		key = (kind, str(start_date), str(end_date))
+		version = self.data_version()
+		with self._lock:
+			entry = self._reports.get(key)
+			if entry is not None and entry[0] == version:
+				self._reports.move_to_end(key)
+				self.report_cache_stats['hits'] += 1
+				return entry[2]
+
+		conn = self.connection()
+		with conn:
+			# One read transaction, so the report and the lookup see the same
+			# snapshot, and storing fails if a write has happened since
+			conn.execute("BEGIN")
+			row = conn.execute(
+				"SELECT id, payload FROM summary_cache WHERE kind = ? AND start_day = ? AND end_day = ?", key
+			).fetchone()
+			if row is not None:
+				row_id = row[0]
+				report = entry[2] if entry is not None and entry[1] == row_id else decode_report(row[1])
+				stat = 'stored_hits'
+			else:
+				report = compute(start_date, end_date)
+				stat = 'misses'
+				try:
+					row_id = conn.execute(
+						"INSERT OR REPLACE INTO summary_cache (kind, start_day, end_day, payload) VALUES (?, ?, ?, ?)",
+						key + (json.dumps(report),)
+					).lastrowid
+					conn.execute(
+						"DELETE FROM summary_cache WHERE id <= ? - ?", (row_id, SUMMARY_CACHE_ROWS)
+					)
+				except sqlite3.OperationalError:
+					# Another connection wrote meanwhile (or holds the lock); the
+					# report matches our snapshot, it just is not stored
+					row_id = None
+
+		with self._lock:
+			self.report_cache_stats[stat] += 1
+			self._reports[key] = (version, row_id, report)
+			self._reports.move_to_end(key)
+			while len(self._reports) > SUMMARY_CACHE_SIZE:
+				self._reports.popitem(last=False)
+		return report
+
+	def get_summary(self, start_date, end_date):
+		"""Aggregate a date range from the daily_totals rollup
+
+		Returns a dict with ``task_count``, ``total_seconds`` and ``tasks``/``tags``
+		lists of (name, seconds) pairs sorted largest first. Only completed
+		tasks are counted, and the cost depends on the number of days in the
+		range rather than the number of tasks. Results are cached until a day
+		in the range changes.
+		"""
+		return self._cached_report('summary', start_date, end_date, self._summary)
+
+	def _summary(self, start_date, end_date):
+		"""Compute get_summary() from daily_totals"""
+		conn = self.connection()
+		bounds = (str(start_date), str(end_date))
+
+		task_count, total_seconds = conn.execute(
+			"SELECT COALESCE(SUM(task_count), 0), COALESCE(SUM(seconds), 0) "
+			"FROM daily_totals WHERE day BETWEEN ? AND ? AND tag = ''",
+			bounds
+		).fetchone()
+
+		tasks = conn.execute("""
+			SELECT name, SUM(seconds) AS total
+			FROM daily_totals
+			WHERE day BETWEEN ? AND ? AND tag = ''
+			GROUP BY name
+			HAVING total > 0
+			ORDER BY total DESC, name
+		""", bounds).fetchall()
+
+		tags = conn.execute("""
+			SELECT tag, SUM(seconds) AS total
+			FROM daily_totals
+			WHERE day BETWEEN ? AND ? AND tag != ''
+			GROUP BY tag
+			HAVING total > 0
+			ORDER BY total DESC, tag
+		""", bounds).fetchall()
+
+		return {
+			'task_count': task_count,
+			'total_seconds': total_seconds,
+			'tasks': tasks,
+			'tags': tags,
+		}
+
+	def get_breakdown(self, start_date, end_date):
+		"""Break down the completed tasks in a date range from the raw tasks
+
+		Returns a dict with ``task_count`` and ``total_seconds``, and lists of
+		(label, seconds) pairs: ``weekdays`` from Monday to Sunday, ``tasks``
+		and ``tags`` largest first and ``days`` oldest first. Results are
+		cached like get_summary().
+		"""
+		return self._cached_report('breakdown', start_date, end_date, self._breakdown)
+
+	def _breakdown(self, start_date, end_date):
+		"""Compute get_breakdown() from a TaskColumns"""
+		columns = self.get_task_columns(start_date, end_date)
+		return {
+			'task_count': len(columns),
+			'total_seconds': columns.total_seconds(),
+			'weekdays': columns.by_weekday(),
+			'tasks': columns.by_name(),
+			'tags': columns.by_tag(),
+			'days': columns.by_day(),
+		}
+
+	def get_task_columns(self, start_date=None, end_date=None):
+		"""Load the completed tasks that started in a date range as a TaskColumns
+
+		Days are matched in the offset each task was recorded with, as in
+		daily_totals. Without both dates every completed task is loaded.
+		"""
+		where, params = "", ()
+		if start_date is not None and end_date is not None:
+			lo, hi = day_range(start_date, end_date)
+			where = ROLLUP_RANGE
+			params = (lo - 86400, hi + 86400, str(start_date), str(end_date))
+		conn = self.connection()
+		# Each column comes back as one string; the aggregates in a query all
+		# see the rows in the same order, so the columns line up
+		tasks = conn.execute(f"""
+			SELECT group_concat(id), group_concat(start_ts), group_concat(tz_offset),
+				group_concat(COALESCE(duration_seconds, 0)), group_concat(name, ?)
+			FROM tasks WHERE end_ts IS NOT NULL {where}
+		""", (NAME_SEPARATOR,) + params).fetchone()
+		tags = conn.execute(f"""
+			SELECT group_concat(task_tags.task_id), group_concat(task_tags.tag_id)
+			FROM tasks JOIN task_tags ON task_tags.task_id = tasks.id
+			WHERE tasks.end_ts IS NOT NULL {where}
+		""", params).fetchone()
+		names = [None] * (conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM tags").fetchone()[0])
+		for tag_id, name in conn.execute("SELECT id, name FROM tags"):
+			names[tag_id] = name
+		return TaskColumns.load(tasks, tags, names)
+
+	@retry_busy
+	def update_task(self, task_id, name, tags, start, end):
+		"""Update an existing task
+
+		``start`` and ``end`` are datetimes (naive ones are local time) or
+		epoch seconds; ``end`` is None for a task that is still running.
+		Giving a running task an end time stops it; a task that is not
+		running must have one, no earlier than its start (ValueError otherwise).
+		"""
+		start_ts, tz_offset = to_epoch(start)
+		end_ts = to_epoch(end)[0] if end is not None else None
+		if end_ts is not None and end_ts < start_ts:
+			raise ValueError("The end time is before the start time")
+		duration = end_ts - start_ts if end_ts is not None else None
+
+		with self._transaction(immediate=True) as cursor:
+			if end_ts is None and not cursor.execute(
+				"SELECT 1 FROM tasks WHERE id = ? AND is_running = 1", (task_id,)
+			).fetchone():
+				raise ValueError(f"Task {task_id} is not running, so it needs an end time")
+			self._rollup(cursor, task_id, -1)
+			cursor.execute(
+				"UPDATE tasks SET name = ?, tags = ?, start_ts = ?, end_ts = ?, duration_seconds = ?, tz_offset = ?, "
+				"is_running = is_running AND ? IS NULL WHERE id = ?",
+				(name, tags, start_ts, end_ts, duration, tz_offset, end_ts, task_id)
+			)
+			self._set_task_tags(cursor, task_id, tags)
+			self._rollup(cursor, task_id, 1)
+		self._notify(updated=[task_id])
+
+	@retry_busy
 	def delete_task(self, task_id):
 		"""Delete a task"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-		conn.commit()
-		conn.close()
-	
+		with self._transaction(immediate=True) as cursor:
+			self._rollup(cursor, task_id, -1)
+			cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+		self._notify(deleted=[task_id])
+
+	@retry_busy
+	def delete_tasks(self, task_ids):
+		"""Delete many tasks in one transaction, returning how many were deleted"""
+		task_ids = list(task_ids)
+		with self._transaction(immediate=True) as cursor:
+			self._stage_ids(cursor, task_ids)
+			self._rollup_batch(cursor, -1)
+			cursor.execute("DELETE FROM tasks WHERE id IN (SELECT id FROM temp.batch_ids)")
+			count = cursor.rowcount
+		self._notify(deleted=task_ids)
+		return count
+
+	@retry_busy
+	def retag_tasks(self, task_ids, tags):
+		"""Replace the tags of many tasks in one transaction, returning how many changed"""
+		task_ids = list(task_ids)
+		names = parse_tags(tags)
+		with self._transaction(immediate=True) as cursor:
+			self._stage_ids(cursor, task_ids)
+			self._rollup_batch(cursor, -1)
+			cursor.execute(
+				"UPDATE tasks SET tags = ? WHERE id IN (SELECT id FROM temp.batch_ids)", (", ".join(names),)
+			)
+			count = cursor.rowcount
+			cursor.execute("DELETE FROM task_tags WHERE task_id IN (SELECT id FROM temp.batch_ids)")
+			cursor.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names])
+			cursor.executemany("""
+				INSERT INTO task_tags (task_id, tag_id)
+				SELECT tasks.id, tags.id FROM tasks, tags
+				WHERE tasks.id IN (SELECT id FROM temp.batch_ids) AND tags.name = ?
+			""", [(n,) for n in names])
+			self._rollup_batch(cursor, 1)
+		self._notify(updated=task_ids)
+		return count
+
+	@retry_busy
+	def rename_tasks(self, task_ids, name):
+		"""Rename many tasks in one transaction, returning how many changed"""
+		task_ids = list(task_ids)
+		with self._transaction(immediate=True) as cursor:
+			self._stage_ids(cursor, task_ids)
+			self._rollup_batch(cursor, -1)
+			cursor.execute("UPDATE tasks SET name = ? WHERE id IN (SELECT id FROM temp.batch_ids)", (name,))
+			count = cursor.rowcount
+			self._rollup_batch(cursor, 1)
+		self._notify(updated=task_ids)
+		return count
+
 	def get_all_tags(self):
-		"""Get unique tags from all tasks"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		cursor.execute("SELECT DISTINCT tags FROM tasks WHERE tags IS NOT NULL AND tags != ''")
-		results = cursor.fetchall()
-		conn.close()
-		
-		# Parse multi-tags
-		tags = set()
-		for row in results:
-			if row[0]:
-				for tag in row[0].split(','):
-					tags.add(tag.strip())
-		return sorted(list(tags))
-	
+		"""Get unique tags that are used by at least one task"""
+		cursor = self.connection().execute("""
+			SELECT name FROM tags
+			WHERE EXISTS (SELECT 1 FROM task_tags WHERE task_tags.tag_id = tags.id)
+			ORDER BY name
+		""")
+		return [row[0] for row in cursor]
+
+	def get_tag_stats(self):
+		"""Get (tag, use count, last start epoch) for every tag in use, for ranking completions"""
+		cursor = self.connection().execute("""
+			SELECT tags.name, COUNT(*), MAX(tasks.start_ts)
+			FROM tags
+			JOIN task_tags ON task_tags.tag_id = tags.id
+			JOIN tasks ON tasks.id = task_tags.task_id
+			GROUP BY tags.id
+		""")
+		return cursor.fetchall()
+
 	def get_setting(self, key, default=None):
 		"""Get a setting value"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		cursor.execute("SELECT value FROM settings WHERE key = ?", (key,))
+		cursor = self.connection().execute("SELECT value FROM settings WHERE key = ?", (key,))
 		result = cursor.fetchone()
-		conn.close()
 		return result[0] if result else default
-	
+
+	@retry_busy
 	def set_setting(self, key, value):
 		"""Set a setting value"""
-		conn = sqlite3.connect(self.db_file)
-		cursor = conn.cursor()
-		cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-		conn.commit()
-		conn.close()
\ No newline at end of file
+		with self._transaction() as cursor:
+			cursor.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
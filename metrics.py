@@ -0,0 +1,214 @@
+"""
+Timing and query metrics helpers for TimePunch
+"""
+
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from columns import TaskColumns
+
+
+# Upper bounds of the latency histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# SQL statements kept per call for the slow-query log
+SQL_SAMPLE_SIZE = 10
+
+
+class StartupProfiler:
+	"""Records named startup phases and prints a breakdown
+
+	Disabled profilers ignore every call, so callers can mark phases
+	unconditionally.
+	"""
+
+	def __init__(self, enabled=False, origin=None):
+		self.enabled = enabled
+		self.origin = origin if origin is not None else time.perf_counter()
+		self.last = self.origin
+		self.phases = []
+		self.reported = False
+
+	def mark(self, phase):
+		"""Record the time since the previous mark under a phase name"""
+		if not self.enabled:
+			return
+		now = time.perf_counter()
+		self.phases.append((phase, now - self.last, now - self.origin))
+		self.last = now
+
+	def report(self, stream=None):
+		"""Print the phase table once"""
+		if not self.enabled or self.reported:
+			return
+		self.reported = True
+		stream = stream or sys.stderr
+		print(f"{'phase':<24}{'took (ms)':>12}{'at (ms)':>12}", file=stream)
+		for phase, took, at in self.phases:
+			print(f"{phase:<24}{took * 1000:>12.1f}{at * 1000:>12.1f}", file=stream)
+
+
+def count_rows(result):
+	"""Return the number of rows in a Database method's result"""
+	if isinstance(result, (list, TaskColumns)):
+		return len(result)
+	if isinstance(result, tuple):
+		return 1
+	if isinstance(result, dict):
+		return sum(len(value) for value in result.values() if isinstance(value, list))
+	return 0
+
+
+class QueryMetrics:
+	"""Per-method call counts, latency histograms and a slow-query log
+
+	Database records every instrumented method call here, along with the
+	SQL statements it executed (from the connection trace callback). Calls
+	can come from any thread. Calls slower than ``slow_ms`` are kept in a
+	bounded log and, if ``stream`` is given, printed to it as they happen.
+	"""
+
+	def __init__(self, slow_ms=100.0, slow_log_size=100, stream=None):
+		self.slow_ms = slow_ms
+		self.stream = stream
+		self._lock = threading.Lock()
+		self._local = threading.local()
+		self._slow_log_size = slow_log_size
+		self.reset()
+
+	def reset(self):
+		"""Discard everything recorded so far"""
+		with self._lock:
+			self.methods = {}
+			self.slow_queries = deque(maxlen=self._slow_log_size)
+			self.untracked_statements = 0
+
+	def _stack(self):
+		stack = getattr(self._local, "stack", None)
+		if stack is None:
+			stack = self._local.stack = []
+		return stack
+
+	@contextmanager
+	def track(self, method):
+		"""Time a call; yields a dict whose ``rows`` entry the caller may set"""
+		call = {'method': method, 'rows': 0, 'statements': 0, 'sql': [], 'error': False}
+		stack = self._stack()
+		stack.append(call)
+		start = time.perf_counter()
+		try:
+			yield call
+		except Exception:
+			call['error'] = True
+			raise
+		finally:
+			elapsed_ms = (time.perf_counter() - start) * 1000
+			stack.pop()
+			self._record(call, elapsed_ms)
+
+	def trace(self, sql):
+		"""sqlite3 trace callback: attribute a statement to the innermost tracked call"""
+		stack = self._stack()
+		if not stack:
+			self.untracked_statements += 1
+			return
+		call = stack[-1]
+		call['statements'] += 1
+		if len(call['sql']) < SQL_SAMPLE_SIZE:
+			call['sql'].append(" ".join(sql.split()))
+
+	def _record(self, call, elapsed_ms):
+		bucket = 0
+		while bucket < len(LATENCY_BUCKETS_MS) and elapsed_ms > LATENCY_BUCKETS_MS[bucket]:
+			bucket += 1
+
+		with self._lock:
+			stats = self.methods.get(call['method'])
+			if stats is None:
+				stats = self.methods[call['method']] = {
+					'calls': 0, 'errors': 0, 'rows': 0, 'statements': 0,
+					'total_ms': 0.0, 'max_ms': 0.0,
+					'histogram': [0] * (len(LATENCY_BUCKETS_MS) + 1),
+				}
+			stats['calls'] += 1
+			stats['errors'] += call['error']
+			stats['rows'] += call['rows']
+			stats['statements'] += call['statements']
+			stats['total_ms'] += elapsed_ms
+			stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+			stats['histogram'][bucket] += 1
+
+			if elapsed_ms < self.slow_ms:
+				return
+			entry = {
+				'time': datetime.now().isoformat(timespec='seconds'),
+				'method': call['method'],
+				'ms': round(elapsed_ms, 3),
+				'statements': call['statements'],
+				'sql': call['sql'],
+			}
+			self.slow_queries.append(entry)
+
+		if self.stream is not None:
+			first = entry['sql'][0] if entry['sql'] else ""
+			print(f"slow query: {entry['method']} took {elapsed_ms:.1f} ms "
+				f"({entry['statements']} statements) {first[:200]}", file=self.stream)
+
+	@staticmethod
+	def percentile(stats, fraction):
+		"""Estimate a method's latency percentile (ms) as the upper bound of its histogram bucket"""
+		target = fraction * stats['calls']
+		seen = 0
+		for bound, count in zip(LATENCY_BUCKETS_MS, stats['histogram']):
+			seen += count
+			if seen >= target:
+				return bound
+		return stats['max_ms']
+
+	def snapshot(self):
+		"""Return everything recorded as a JSON-serialisable dict"""
+		with self._lock:
+			return {
+				'slow_ms': self.slow_ms,
+				'buckets_ms': list(LATENCY_BUCKETS_MS),
+				'methods': {
+					name: dict(stats, histogram=list(stats['histogram']),
+						total_ms=round(stats['total_ms'], 3), max_ms=round(stats['max_ms'], 3))
+					for name, stats in self.methods.items()
+				},
+				'untracked_statements': self.untracked_statements,
+				'slow_queries': list(self.slow_queries),
+			}
+
+	def format_report(self, histograms=False):
+		"""Return the metrics as a plain-text table"""
+		snapshot = self.snapshot()
+		lines = [
+			f"{'method':<26}{'calls':>7}{'errors':>7}{'rows':>9}{'stmts':>8}"
+			f"{'mean ms':>10}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>10}"
+		]
+		methods = sorted(snapshot['methods'].items(), key=lambda item: -item[1]['total_ms'])
+		for name, stats in methods:
+			lines.append(
+				f"{name:<26}{stats['calls']:>7}{stats['errors']:>7}{stats['rows']:>9}{stats['statements']:>8}"
+				f"{stats['total_ms'] / stats['calls']:>10.2f}{self.percentile(stats, 0.5):>9g}"
+				f"{self.percentile(stats, 0.95):>9g}{stats['max_ms']:>10.2f}"
+			)
+		if not methods:
+			lines.append("(no calls recorded)")
+
+		if histograms and methods:
+			labels = [f"<={bound:g}" for bound in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]:g}"]
+			lines += ["", "Latency histogram (ms)", f"{'method':<26}" + "".join(f"{l:>8}" for l in labels)]
+			for name, stats in methods:
+				lines.append(f"{name:<26}" + "".join(f"{c or '':>8}" for c in stats['histogram']))
+
+		lines += ["", f"Slow queries (>= {snapshot['slow_ms']:g} ms): {len(snapshot['slow_queries'])}"]
+		for entry in snapshot['slow_queries']:
+			lines.append(f"{entry['time']}  {entry['method']}  {entry['ms']:.1f} ms  {entry['statements']} statements")
+			lines += [f"    {sql[:200]}" for sql in entry['sql']]
+		return "\n".join(lines)
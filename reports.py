@@ -0,0 +1,112 @@
+"""
+Text reports for TimePunch
+"""
+
+import csv
+import json
+from datetime import datetime, timedelta
+
+
+PERIOD_TITLES = {
+	'day': "Daily Summary",
+	'week': "Weekly Summary",
+	'month': "Monthly Summary",
+	'year': "Yearly Summary",
+}
+
+
+def period_range(period, today=None):
+	"""Return (start_date, end_date) ISO strings for 'day', 'week', 'month' or 'year' up to today"""
+	today = today or datetime.now().date()
+	if period == 'day':
+		start = today
+	elif period == 'week':
+		start = today - timedelta(days=today.weekday())
+	elif period == 'month':
+		start = today.replace(day=1)
+	elif period == 'year':
+		start = today.replace(month=1, day=1)
+	else:
+		raise ValueError(f"Unknown period: {period}")
+	return start.isoformat(), today.isoformat()
+
+
+def format_summary(summary, title):
+	"""Format a Database.get_summary() result as plain text"""
+	if not summary['task_count']:
+		return f"No tasks found for {title.lower()}."
+	
+	lines = [f"{title}\n{'=' * len(title)}\n"]
+	
+	lines.append("BY TASK:")
+	for task, seconds in summary['tasks']:
+		hours = seconds / 3600
+		lines.append(f"  {task}: {hours:.2f}h")
+	
+	if summary['tags']:
+		lines.append("\nBY TAG:")
+		for tag, seconds in summary['tags']:
+			hours = seconds / 3600
+			lines.append(f"  {tag}: {hours:.2f}h")
+	
+	total_hours = summary['total_seconds'] / 3600
+	lines.append(f"\nTOTAL: {total_hours:.2f} hours")
+	
+	return "\n".join(lines)
+
+
+def generate_summary(db, start_date, end_date, title):
+	"""Generate a text summary for a date range"""
+	return format_summary(db.get_summary(start_date, end_date), title)
+
+
+def format_breakdown(breakdown, title):
+	"""Format a Database.get_breakdown() result as time per weekday, task, tag and day"""
+	if not breakdown['task_count']:
+		return f"No tasks found for {title.lower()}."
+	
+	lines = [f"{title}\n{'=' * len(title)}\n"]
+	sections = (
+		("BY WEEKDAY", breakdown['weekdays']),
+		("BY TASK", breakdown['tasks']),
+		("BY TAG", breakdown['tags']),
+		("BY DAY", breakdown['days']),
+	)
+	for heading, rows in sections:
+		if rows:
+			lines.append(f"{heading}:")
+			lines.extend(f"  {label}: {seconds / 3600:.2f}h" for label, seconds in rows)
+			lines.append("")
+	
+	total_hours = breakdown['total_seconds'] / 3600
+	lines.append(f"TOTAL: {total_hours:.2f} hours ({breakdown['task_count']} tasks)")
+	return "\n".join(lines)
+
+
+def generate_breakdown(db, start_date, end_date, title):
+	"""Generate a detailed text breakdown for a date range from the raw tasks"""
+	return format_breakdown(db.get_breakdown(start_date, end_date), title)
+
+
+def iter_summary_rows(summary):
+	"""Yield (kind, name, seconds) rows for a Database.get_summary() result"""
+	for name, seconds in summary['tasks']:
+		yield 'task', name, seconds
+	for name, seconds in summary['tags']:
+		yield 'tag', name, seconds
+	yield 'total', '', summary['total_seconds']
+
+
+def export_summary(summary, out, fmt='csv'):
+	"""Write a summary to a text stream as CSV or JSON lines"""
+	fields = ('kind', 'name', 'seconds', 'hours')
+	writer = None
+	if fmt != 'jsonl':
+		writer = csv.writer(out)
+		writer.writerow(fields)
+	for kind, name, seconds in iter_summary_rows(summary):
+		row = (kind, name, seconds, round(seconds / 3600, 2))
+		if writer:
+			writer.writerow(row)
+		else:
+			out.write(json.dumps(dict(zip(fields, row))) + "\n")
@@ -0,0 +1,436 @@
+"""
+Local JSON API server for TimePunch
+
+A small asyncio HTTP/1.1 server over Database for editor plugins, CI hooks
+and bots. It listens on localhost or a unix socket:
+
+	GET  /running                    the running task, or null
+	POST /start    {"name", "tags", "switch"}
+	POST /stop     {"id"}            (default: the running task)
+	GET  /tasks    ?limit&after&before&name&tag&from&to, or ?q&limit&offset
+	GET  /summary  ?period=day|week|month|year, or ?from&to; &breakdown=1
+
+Reads run concurrently on a thread pool, each thread with its own
+connection. Writes go to a single thread, so they share one connection and
+are applied in the order they arrive. With ``group_commit``, starts and
+stops go through the Database's WriteQueue instead, so bursts of punches
+share transactions.
+
+Web pages must not drive the API: requests carrying an Origin header, or
+(over TCP) a Host other than localhost on the listening port, are refused,
+and POST bodies must be sent as application/json, which a page cannot do
+cross-origin without a preflight.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import signal
+import sys
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from urllib.parse import parse_qsl, urlsplit
+
+from database import EXPORT_FIELDS, TaskAlreadyRunning, from_epoch
+from reports import period_range
+
+
+DEFAULT_PORT = 8765
+
+# Largest request body accepted, in bytes
+MAX_BODY = 1 << 20
+
+# Most tasks returned by one /tasks request
+MAX_PAGE = 500
+
+# Host header names the server answers to, with the listening port appended
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "[::1]")
+
+REASONS = {
+	200: "OK", 201: "Created", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+	405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 415: "Unsupported Media Type",
+	500: "Internal Server Error",
+}
+
+
+class ApiError(Exception):
+	"""An error reported to the client as a JSON body with an HTTP status"""
+
+	def __init__(self, status, message, **extra):
+		super().__init__(message)
+		self.status = status
+		self.extra = extra
+
+	def payload(self):
+		return {'error': str(self), **self.extra}
+
+
+def task_json(task):
+	"""Return a task row as a JSON-ready dict, with ISO 8601 times"""
+	if task is None:
+		return None
+	values = (
+		task[0], task[1], task[2], from_epoch(task[3], task[7]).isoformat(),
+		from_epoch(task[4], task[7]).isoformat() if task[4] is not None else None,
+		task[5]
+	)
+	return {**dict(zip(EXPORT_FIELDS, values)), 'running': bool(task[6])}
+
+
+def page_cursor(task):
+	"""Return the (start_ts, id) paging cursor of a task row as text"""
+	return f"{task[3]}:{task[0]}"
+
+
+def parse_cursor(text):
+	"""Parse a paging cursor made by page_cursor()"""
+	if text is None:
+		return None
+	try:
+		start_ts, task_id = text.split(":")
+		return int(start_ts), int(task_id)
+	except ValueError:
+		raise ApiError(400, f"Bad cursor: {text!r}") from None
+
+
+def int_param(query, name, default, low, high):
+	"""Read an integer query parameter, clamped to low..high"""
+	try:
+		value = int(query.get(name, default))
+	except ValueError:
+		raise ApiError(400, f"{name} must be an integer") from None
+	return max(low, min(high, value))
+
+
+def id_field(data):
+	"""Read the optional task ``id`` of a request body"""
+	value = data.get('id')
+	if value is None:
+		return None
+	try:
+		value = int(value)
+	except (TypeError, ValueError):
+		raise ApiError(400, "id must be an integer") from None
+	# SQLite integers are 64-bit; a larger one would fail in the driver
+	if not -1 << 63 <= value < 1 << 63:
+		raise ApiError(400, "id must be an integer")
+	return value
+
+
+def date_param(query, name):
+	"""Read an optional YYYY-MM-DD query parameter"""
+	value = query.get(name)
+	if value is None:
+		return None
+	try:
+		return date.fromisoformat(value).isoformat()
+	except ValueError:
+		raise ApiError(400, f"{name} must be a YYYY-MM-DD date") from None
+
+
+def encode_response(status, payload, keep_alive=True):
+	"""Return the bytes of an HTTP response with a JSON body"""
+	body = json.dumps(payload).encode()
+	head = (
+		f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+		"Content-Type: application/json\r\n"
+		f"Content-Length: {len(body)}\r\n"
+		f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+	)
+	return head.encode() + body
+
+
+async def read_message(reader):
+	"""Read an HTTP message: (start line, headers, body), or None at end of stream"""
+	line = await reader.readline()
+	if not line.strip():
+		return None
+	headers = {}
+	while True:
+		header = await reader.readline()
+		if header in (b"\r\n", b"\n", b""):
+			break
+		name, _, value = header.decode("latin-1").partition(":")
+		headers[name.strip().lower()] = value.strip()
+	length = int(headers.get("content-length", 0))
+	if length > MAX_BODY:
+		raise ApiError(413, f"Request bodies are limited to {MAX_BODY} bytes")
+	body = await reader.readexactly(length) if length else b""
+	return line.decode("latin-1").rstrip("\r\n"), headers, body
+
+
+class ApiServer:
+	"""Serves the JSON API for one Database
+
+	``start()`` begins accepting connections on the running event loop;
+	``close()`` stops listening and shuts the thread pools down.
+	"""
+
+	def __init__(self, db, host="127.0.0.1", port=DEFAULT_PORT, path=None, read_threads=4,
+			group_commit=False):
+		self.db = db
+		self.queue = db.write_queue() if group_commit else None
+		self.host = host
+		self.port = port
+		self.path = path
+		self.server = None
+		self.hosts = None  # Host header values accepted over TCP, set by start()
+		self._connections = {}  # handler task -> writer, for each open connection
+		self.read_pool = ThreadPoolExecutor(read_threads, thread_name_prefix="api-read")
+		# One thread, and so one connection, for every write
+		self.write_pool = ThreadPoolExecutor(1, thread_name_prefix="api-write")
+		self.routes = {
+			'/running': ('GET', self.get_running),
+			'/start': ('POST', self.start_task),
+			'/stop': ('POST', self.stop_task),
+			'/tasks': ('GET', self.get_tasks),
+			'/summary': ('GET', self.get_summary),
+		}
+
+	async def start(self):
+		"""Start listening, on the unix socket ``path`` if one was given"""
+		if self.path:
+			self.server = await asyncio.start_unix_server(self._handle, path=self.path)
+			os.chmod(self.path, 0o600)
+		else:
+			self.server = await asyncio.start_server(self._handle, self.host, self.port)
+			port = self.server.sockets[0].getsockname()[1]
+			self.hosts = {f"{host}:{port}" for host in LOCAL_HOSTS}
+		return self
+
+	@property
+	def address(self):
+		"""Return where the server listens, e.g. 'http://127.0.0.1:8765'"""
+		if self.path:
+			return f"unix:{self.path}"
+		host, port = self.server.sockets[0].getsockname()[:2]
+		return f"http://{host}:{port}"
+
+	async def close(self):
+		"""Stop listening and wait for queued writes to finish"""
+		if self.server is not None:
+			self.server.close()
+			# Idle keep-alive connections would otherwise keep their handlers
+			# (and, on newer Pythons, wait_closed()) waiting for a request
+			for writer in list(self._connections.values()):
+				writer.close()
+			await asyncio.gather(*self._connections, return_exceptions=True)
+			await self.server.wait_closed()
+		self.read_pool.shutdown()
+		self.write_pool.shutdown()
+		if self.queue is not None:
+			await asyncio.get_running_loop().run_in_executor(None, self.queue.flush)
+		if self.path and os.path.exists(self.path):
+			os.unlink(self.path)
+
+	def read(self, fn, *args, **kwargs):
+		"""Run a read-only call on the read pool"""
+		return asyncio.get_running_loop().run_in_executor(self.read_pool, functools.partial(fn, *args, **kwargs))
+
+	def write(self, fn, *args, **kwargs):
+		"""Run a mutating call on the single writer thread"""
+		return asyncio.get_running_loop().run_in_executor(self.write_pool, functools.partial(fn, *args, **kwargs))
+
+	async def _handle(self, reader, writer):
+		"""Answer requests on one connection until the client closes it"""
+		task = asyncio.current_task()
+		self._connections[task] = writer
+		try:
+			while True:
+				try:
+					message = await read_message(reader)
+				except ApiError as e:
+					writer.write(encode_response(e.status, e.payload(), keep_alive=False))
+					break
+				if message is None:
+					break
+				line, headers, body = message
+				method, target, version = (line.split(" ") + ["", ""])[:3]
+				keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+				status, payload = await self.dispatch(method, target, headers, body)
+				writer.write(encode_response(status, payload, keep_alive))
+				await writer.drain()
+				if not keep_alive:
+					break
+		except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+			pass
+		finally:
+			self._connections.pop(task, None)
+			writer.close()
+
+	def check_headers(self, method, headers):
+		"""Refuse requests a web page could have sent (DNS rebinding, cross-site POSTs)"""
+		if "origin" in headers:
+			raise ApiError(403, "Requests from web pages are not accepted")
+		if self.hosts is not None and headers.get("host", "").lower() not in self.hosts:
+			raise ApiError(403, "The Host header must name this server on localhost")
+		if method == "POST" and headers.get("content-type", "").partition(";")[0].strip().lower() != "application/json":
+			raise ApiError(415, "POST bodies must be sent as application/json")
+
+	async def dispatch(self, method, target, headers, body=b""):
+		"""Route one request, given its lower-cased headers, and return (status, JSON payload)"""
+		try:
+			self.check_headers(method, headers)
+		except ApiError as e:
+			return e.status, e.payload()
+		url = urlsplit(target)
+		route = self.routes.get(url.path)
+		if route is None:
+			return 404, {'error': f"No such endpoint: {url.path}"}
+		if method != route[0]:
+			return 405, {'error': f"{url.path} expects {route[0]}"}
+		try:
+			data = json.loads(body) if body else {}
+			if not isinstance(data, dict):
+				raise ApiError(400, "The request body must be a JSON object")
+			return await route[1](dict(parse_qsl(url.query)), data)
+		except ApiError as e:
+			return e.status, e.payload()
+		except ValueError as e:
+			return 400, {'error': str(e)}
+		except Exception:
+			traceback.print_exc(file=sys.stderr)
+			return 500, {'error': "Internal server error"}
+
+	async def get_running(self, query, data):
+		return 200, {'task': task_json(await self.read(self.db.get_running_task))}
+
+	async def start_task(self, query, data):
+		name = str(data.get('name') or "").strip()
+		if not name:
+			raise ApiError(400, "name is required")
+		tags, switch = str(data.get('tags') or ""), bool(data.get('switch'))
+		try:
+			if self.queue is not None:
+				task_id = await asyncio.wrap_future(self.queue.start_task(name, tags, switch))
+				task = await self.read(self.db.get_task, task_id)
+			else:
+				task = await self.write(self._start, name, tags, switch)
+		except TaskAlreadyRunning as e:
+			raise ApiError(409, str(e), task_id=e.task_id) from None
+		return 201, {'task': task_json(task)}
+
+	def _start(self, name, tags, switch):
+		"""Start a task and return its row (runs on the writer thread)"""
+		return self.db.get_task(self.db.start_task(name, tags, switch=switch))
+
+	async def stop_task(self, query, data):
+		task_id = id_field(data)
+		if self.queue is None:
+			return 200, {'task': task_json(await self.write(self._stop, task_id))}
+		if task_id is None:
+			running = await self.read(self.db.get_running_task)
+			if running is None:
+				raise ApiError(409, "No active task")
+			task_id = running[0]
+		if not await asyncio.wrap_future(self.queue.stop_task(task_id)):
+			raise ApiError(409, f"Task {task_id} is not running", task_id=task_id)
+		return 200, {'task': task_json(await self.read(self.db.get_task, task_id))}
+
+	def _stop(self, task_id):
+		"""Stop a task, or the running one, and return its row (runs on the writer thread)"""
+		if task_id is None:
+			running = self.db.get_running_task()
+			if running is None:
+				raise ApiError(409, "No active task")
+			task_id = running[0]
+		if not self.db.stop_task(task_id):
+			raise ApiError(409, f"Task {task_id} is not running", task_id=task_id)
+		return self.db.get_task(task_id)
+
+	async def get_tasks(self, query, data):
+		limit = int_param(query, 'limit', 50, 1, MAX_PAGE)
+		if query.get('q'):
+			offset = int_param(query, 'offset', 0, 0, sys.maxsize)
+			rows = await self.read(self.db.search_tasks, query['q'], limit, offset)
+			return 200, {'tasks': [task_json(task) for task in rows]}
+		rows = await self.read(
+			self.db.get_tasks_page, limit,
+			after=parse_cursor(query.get('after')), before=parse_cursor(query.get('before')),
+			name=query.get('name'), tag=query.get('tag'),
+			start_date=date_param(query, 'from'), end_date=date_param(query, 'to')
+		)
+		return 200, {
+			'tasks': [task_json(task) for task in rows],
+			# Cursors for the next (older) and previous (newer) pages
+			'next': page_cursor(rows[-1]) if len(rows) == limit else None,
+			'previous': page_cursor(rows[0]) if rows else None,
+		}
+
+	async def get_summary(self, query, data):
+		start, end = date_param(query, 'from'), date_param(query, 'to')
+		if start is None or end is None:
+			if start is not None or end is not None:
+				raise ApiError(400, "from and to go together")
+			start, end = period_range(query.get('period', 'day'))
+		report = self.db.get_breakdown if query.get('breakdown') in ('1', 'true') else self.db.get_summary
+		return 200, {'start': start, 'end': end, **await self.read(report, start, end)}
+
+
+class ApiClient:
+	"""Minimal asyncio client for ApiServer, over TCP or a unix socket
+
+	One keep-alive connection; ``request`` returns (status, JSON payload).
+	"""
+
+	def __init__(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+		self.host = host
+		self.port = port
+		self.path = path
+		self.reader = self.writer = None
+
+	async def connect(self):
+		if self.path:
+			self.reader, self.writer = await asyncio.open_unix_connection(self.path)
+		else:
+			self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+		return self
+
+	async def close(self):
+		if self.writer is not None:
+			self.writer.close()
+			await self.writer.wait_closed()
+			self.reader = self.writer = None
+
+	def host_header(self):
+		"""Return the Host header value for this server"""
+		if self.path:
+			return "localhost"
+		host = f"[{self.host}]" if ":" in self.host else self.host
+		return f"{host}:{self.port}"
+
+	async def request(self, method, target, data=None):
+		if self.writer is None:
+			await self.connect()
+		body = json.dumps(data).encode() if data is not None else b""
+		self.writer.write(
+			f"{method} {target} HTTP/1.1\r\nHost: {self.host_header()}\r\n"
+			f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+		)
+		await self.writer.drain()
+		message = await read_message(self.reader)
+		if message is None:
+			raise ConnectionError("The server closed the connection")
+		line, headers, payload = message
+		if headers.get("connection", "").lower() == "close":
+			await self.close()
+		return int(line.split(" ")[1]), json.loads(payload)
+
+
+async def serve(db, host="127.0.0.1", port=DEFAULT_PORT, path=None, group_commit=False):
+	"""Run an ApiServer until interrupted or terminated, then shut it down cleanly"""
+	server = await ApiServer(db, host, port, path, group_commit=group_commit).start()
+	print(f"Serving the TimePunch API on {server.address}", file=sys.stderr)
+	stop = asyncio.Event()
+	loop = asyncio.get_running_loop()
+	for signum in (signal.SIGINT, signal.SIGTERM):
+		try:
+			loop.add_signal_handler(signum, stop.set)
+		except NotImplementedError:
+			pass  # Windows: Ctrl+C still raises KeyboardInterrupt
+	try:
+		await stop.wait()
+	finally:
+		await server.close()
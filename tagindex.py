@@ -0,0 +1,108 @@
+"""
+Tag prefix index for TimePunch autocompletion
+
+Pure Python so it can be used (and timed) without Qt.
+"""
+
+import heapq
+import math
+import time
+from bisect import bisect_left, insort
+from datetime import datetime
+
+from database import parse_tags
+
+
+# Days for a tag's recency boost to halve
+RECENCY_HALF_LIFE_DAYS = 14
+# Weight of a just-used tag's recency boost relative to log(frequency)
+RECENCY_WEIGHT = 2.0
+
+
+def split_token(text):
+	"""Split a comma-separated tag field into (text before the last tag, last tag)
+
+	The head keeps its trailing comma and a single space, so
+	``head + completion`` is the completed field text.
+	"""
+	head, sep, token = text.rpartition(',')
+	if not sep:
+		return "", text.lstrip()
+	return head + ", ", token.lstrip()
+
+
+def timestamp(value):
+	"""Return an ISO time string, datetime or epoch time as epoch seconds"""
+	if isinstance(value, (int, float)):
+		return value
+	if isinstance(value, str):
+		value = datetime.fromisoformat(value)
+	return value.timestamp()
+
+
+class TagIndex:
+	"""Sorted prefix index over tag names, ranked by frequency and recency
+
+	Lookups binary-search a sorted list of lower-cased names, so finding
+	the tags for a prefix costs O(log n) plus the matches; only those
+	matches are scored. ``add`` and ``remove`` keep the index current as
+	tasks are saved, so it is only built from a full scan once.
+	"""
+
+	def __init__(self, stats=()):
+		self._keys = []    # sorted (name.lower(), name)
+		self._stats = {}   # name -> [use count, last used (epoch seconds)]
+		self.load(stats)
+
+	def __len__(self):
+		return len(self._stats)
+
+	def load(self, stats):
+		"""Replace the index with (name, count, last_used) rows from Database.get_tag_stats"""
+		self._stats = {name: [count, timestamp(last_used)] for name, count, last_used in stats}
+		self._keys = sorted((name.lower(), name) for name in self._stats)
+
+	def add(self, tags, used_at=None):
+		"""Count one more use of each tag in a comma-separated string or list"""
+		used = timestamp(used_at) if used_at is not None else time.time()
+		for name in parse_tags(tags) if isinstance(tags, str) else tags:
+			stats = self._stats.get(name)
+			if stats is None:
+				self._stats[name] = [1, used]
+				insort(self._keys, (name.lower(), name))
+			else:
+				stats[0] += 1
+				stats[1] = max(stats[1], used)
+
+	def remove(self, tags):
+		"""Count one fewer use of each tag, dropping tags that are no longer used"""
+		for name in parse_tags(tags) if isinstance(tags, str) else tags:
+			stats = self._stats.get(name)
+			if stats is None:
+				continue
+			stats[0] -= 1
+			if stats[0] <= 0:
+				del self._stats[name]
+				key = (name.lower(), name)
+				del self._keys[bisect_left(self._keys, key)]
+
+	def score(self, name, now=None):
+		"""Rank a tag: log frequency plus a boost that decays with time since last use"""
+		count, last_used = self._stats[name]
+		age_days = max(0.0, ((now or time.time()) - last_used) / 86400)
+		return math.log1p(count) + RECENCY_WEIGHT * 0.5 ** (age_days / RECENCY_HALF_LIFE_DAYS)
+
+	def complete(self, prefix, limit=10, exclude=()):
+		"""Return up to ``limit`` tags starting with ``prefix`` (any case), best first"""
+		key = prefix.strip().lower()
+		lo = bisect_left(self._keys, (key,))
+		hi = bisect_left(self._keys, (key + "\uffff",)) if key else len(self._keys)
+		excluded = {name.lower() for name in exclude}
+		now = time.time()
+		matches = (name for lowered, name in self._keys[lo:hi] if lowered not in excluded)
+		return heapq.nlargest(limit, matches, key=lambda name: self.score(name, now))
+
+	def complete_field(self, text, limit=10):
+		"""Complete the last tag of a comma-separated field, skipping tags already entered"""
+		head, token = split_token(text)
+		return self.complete(token, limit, exclude=parse_tags(head))
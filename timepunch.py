@@ -1,23 +1,56 @@
 """
 TimePunch - Modern Time Tracking Application
 Main entry point
+
+With no arguments (or ``gui``) the window is started; any other command is
+handled by the command-line interface, which never imports PySide6.
+Pass ``--profile-startup`` to the GUI to print a startup timing breakdown,
+and ``--metrics`` to record query metrics (shown under Diagnostics, Ctrl+D).
 """
 
 import sys
-from PySide6.QtWidgets import QApplication
-from ui.main_window import TimePunchWindow
+import time
 
+_STARTED = time.perf_counter()
 
-def main():
-	"""Main entry point"""
+
+def run_gui(profile_startup=False, query_metrics=False):
+	"""Start the Qt application"""
+	from metrics import StartupProfiler
+	profiler = StartupProfiler(enabled=profile_startup, origin=_STARTED)
+	
+	from PySide6.QtWidgets import QApplication
+	profiler.mark("import PySide6")
+	
 	app = QApplication(sys.argv)
 	app.setApplicationName("TimePunch")
+	profiler.mark("create QApplication")
 	
-	window = TimePunchWindow()
+	from ui.main_window import TimePunchWindow
+	profiler.mark("import main window")
+	
+	window = TimePunchWindow(profiler=profiler, query_metrics=query_metrics)
 	window.show()
+	profiler.mark("show window")
 	
 	sys.exit(app.exec())
 
 
+def main():
+	"""Main entry point"""
+	args = sys.argv[1:]
+	profile_startup = "--profile-startup" in args
+	if profile_startup:
+		args.remove("--profile-startup")
+	
+	# --metrics is also a CLI option, so only the GUI strips it
+	gui_args = [arg for arg in args if arg != "--metrics"]
+	if not gui_args or gui_args[0] == "gui":
+		run_gui(profile_startup, query_metrics=len(gui_args) != len(args))
+	else:
+		from cli import main as cli_main
+		sys.exit(cli_main(args))
+
+
 if __name__ == "__main__":
-	main()
\ No newline at end of file
+	main()
@@ -1,9 +1,24 @@
 """
 UI package for TimePunch
+
+Members are imported on first access so that importing one module (such as
+the main window) does not pull in every dialog.
 """
 
-from ui.main_window import TimePunchWindow
-from ui.dialogs import EditTaskDialog, SummaryDialog, CustomRangeSummaryDialog
-from ui.styles import get_stylesheet
+import importlib
+
+_EXPORTS = {
+	'TimePunchWindow': 'ui.main_window',
+	'EditTaskDialog': 'ui.dialogs',
+	'SummaryDialog': 'ui.dialogs',
+	'CustomRangeSummaryDialog': 'ui.dialogs',
+	'get_stylesheet': 'ui.styles',
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = ['TimePunchWindow', 'EditTaskDialog', 'SummaryDialog', 'CustomRangeSummaryDialog', 'get_stylesheet']
\ No newline at end of file
+def __getattr__(name):
+	if name not in _EXPORTS:
+		raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+	return getattr(importlib.import_module(_EXPORTS[name]), name)
@@ -4,10 +4,16 @@ Dialog windows for TimePunch
 
 from PySide6.QtWidgets import (
 	QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, 
-	QPushButton, QTextEdit, QDialogButtonBox, QComboBox
+	QPushButton, QTextEdit, QDialogButtonBox, QComboBox,
+	QDoubleSpinBox, QFileDialog
 )
 from PySide6.QtCore import QDate
+from PySide6.QtGui import QFontDatabase
 from datetime import datetime, timedelta
+import json
+
+# Format of the editable times in EditTaskDialog (local time)
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 
 class EditTaskDialog(QDialog):
@@ -39,13 +45,14 @@ class EditTaskDialog(QDialog):
 		# Start time
 		layout.addWidget(QLabel("Start Time (YYYY-MM-DD HH:MM:SS):"))
 		self.start_input = QLineEdit()
-		self.start_input.setText(self.task_data[3])
+		self.start_input.setText(datetime.fromtimestamp(self.task_data[3]).strftime(TIME_FORMAT))
 		layout.addWidget(self.start_input)
 		
 		# End time
 		layout.addWidget(QLabel("End Time (YYYY-MM-DD HH:MM:SS):"))
 		self.end_input = QLineEdit()
-		self.end_input.setText(self.task_data[4] or "")
+		if self.task_data[4] is not None:
+			self.end_input.setText(datetime.fromtimestamp(self.task_data[4]).strftime(TIME_FORMAT))
 		layout.addWidget(self.end_input)
 		
 		# Buttons
@@ -59,12 +66,13 @@ class EditTaskDialog(QDialog):
 		self.setLayout(layout)
 	
 	def get_data(self):
-		"""Return edited data"""
+		"""Return edited data, with times as local datetimes (raises ValueError if unparseable)"""
+		end_text = self.end_input.text().strip()
 		return {
 			'name': self.name_input.text(),
 			'tags': self.tags_input.text(),
-			'start_time': self.start_input.text(),
-			'end_time': self.end_input.text()
+			'start_time': datetime.fromisoformat(self.start_input.text().strip()),
+			'end_time': datetime.fromisoformat(end_text) if end_text else None
 		}
 
 
@@ -152,4 +160,99 @@ class CustomRangeSummaryDialog(QDialog):
 		else:
 			end_date = (datetime(year, month + 1, 1).date() - timedelta(days=1))
 		
-		return start_date.isoformat(), end_date.isoformat()
\ No newline at end of file
+		return start_date.isoformat(), end_date.isoformat()
+
+
+class DiagnosticsDialog(QDialog):
+	"""Dialog showing the database's query metrics and slow-query log"""
+	
+	def __init__(self, db, parent=None):
+		super().__init__(parent)
+		self.db = db
+		self.setWindowTitle("Diagnostics")
+		self.setMinimumSize(900, 500)
+		self.setup_ui()
+		self.refresh()
+	
+	def setup_ui(self):
+		layout = QVBoxLayout()
+		
+		# Slow query threshold
+		threshold_layout = QHBoxLayout()
+		threshold_layout.addWidget(QLabel("Slow query threshold (ms):"))
+		self.threshold_input = QDoubleSpinBox()
+		self.threshold_input.setRange(0, 60000)
+		self.threshold_input.setDecimals(1)
+		self.threshold_input.valueChanged.connect(self.set_threshold)
+		threshold_layout.addWidget(self.threshold_input)
+		threshold_layout.addStretch()
+		layout.addLayout(threshold_layout)
+		
+		self.report = QTextEdit()
+		self.report.setReadOnly(True)
+		self.report.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap)
+		self.report.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+		layout.addWidget(self.report)
+		
+		# Buttons
+		btn_layout = QHBoxLayout()
+		self.enable_btn = QPushButton("Enable")
+		self.enable_btn.clicked.connect(self.enable)
+		btn_layout.addWidget(self.enable_btn)
+		
+		refresh_btn = QPushButton("Refresh")
+		refresh_btn.clicked.connect(self.refresh)
+		btn_layout.addWidget(refresh_btn)
+		
+		self.reset_btn = QPushButton("Reset")
+		self.reset_btn.clicked.connect(self.reset)
+		btn_layout.addWidget(self.reset_btn)
+		
+		self.save_btn = QPushButton("Save JSON...")
+		self.save_btn.clicked.connect(self.save)
+		btn_layout.addWidget(self.save_btn)
+		
+		close_btn = QPushButton("Close")
+		close_btn.clicked.connect(self.accept)
+		btn_layout.addWidget(close_btn)
+		layout.addLayout(btn_layout)
+		
+		self.setLayout(layout)
+	
+	def refresh(self):
+		"""Show the latest metrics"""
+		metrics = self.db.metrics
+		enabled = metrics is not None
+		self.enable_btn.setVisible(not enabled)
+		for widget in (self.threshold_input, self.reset_btn, self.save_btn):
+			widget.setEnabled(enabled)
+		if not enabled:
+			self.report.setPlainText(
+				"Query instrumentation is off.\n\n"
+				"Click Enable to start recording, or start TimePunch with --metrics."
+			)
+			return
+		self.threshold_input.blockSignals(True)
+		self.threshold_input.setValue(metrics.slow_ms)
+		self.threshold_input.blockSignals(False)
+		self.report.setPlainText(metrics.format_report(histograms=True))
+	
+	def enable(self):
+		"""Turn on instrumentation for the rest of the session"""
+		self.db.enable_metrics()
+		self.refresh()
+	
+	def set_threshold(self, value):
+		if self.db.metrics is not None:
+			self.db.metrics.slow_ms = value
+	
+	def reset(self):
+		self.db.metrics.reset()
+		self.refresh()
+	
+	def save(self):
+		"""Write the metrics snapshot to a JSON file"""
+		path, _ = QFileDialog.getSaveFileName(self, "Save Metrics", "timepunch-metrics.json", "JSON (*.json)")
+		if path:
+			with open(path, 'w', encoding='utf-8') as out:
+				json.dump(self.db.metrics.snapshot(), out, indent=2)
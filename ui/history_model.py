@@ -0,0 +1,257 @@
+"""
+Task history model and delegate for TimePunch
+"""
+
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, QRect, QEvent, Signal
+from PySide6.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QPushButton
+from datetime import datetime
+
+
+COLUMNS = ["Task", "Tags", "Start", "End", "Duration", "Actions"]
+ACTIONS_COLUMN = 5
+TaskIdRole = Qt.ItemDataRole.UserRole
+
+
+def format_duration(seconds):
+	"""Format seconds as HH:MM:SS"""
+	hours, remainder = divmod(seconds, 3600)
+	minutes, seconds = divmod(remainder, 60)
+	return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+class HistoryModel(QAbstractTableModel):
+	"""Table model over the tasks table, fetched from the database a page at a time
+
+	With a search set, the rows are the search results in relevance order
+	instead of the full history.
+	"""
+
+	# Re-emits Database change events so they are handled on the GUI thread
+	changed = Signal(object)
+	# Emitted after each page of rows has been appended
+	pageLoaded = Signal()
+
+	def __init__(self, db, worker, page_size=100, parent=None):
+		super().__init__(parent)
+		self.db = db
+		self.worker = worker
+		self.page_size = page_size
+		self._rows = []
+		self._exhausted = False
+		self._fetching = False
+		self.search = ""
+		self.changed.connect(self.apply_change)
+		db.subscribe(self.changed.emit)
+
+	def rowCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(self._rows)
+
+	def columnCount(self, parent=QModelIndex()):
+		return 0 if parent.isValid() else len(COLUMNS)
+
+	def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+		if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+			return COLUMNS[section]
+		return None
+
+	def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+		if not index.isValid():
+			return None
+		task = self._rows[index.row()]
+
+		if role == TaskIdRole:
+			return task[0]
+		if role != Qt.ItemDataRole.DisplayRole:
+			return None
+
+		column = index.column()
+		if column == 0:
+			return task[1]
+		if column == 1:
+			return task[2] or ""
+		if column == 2:
+			return datetime.fromtimestamp(task[3]).strftime("%d/%m %H:%M")
+		if column == 3:
+			return datetime.fromtimestamp(task[4]).strftime("%d/%m %H:%M") if task[4] is not None else "Running..."
+		if column == 4:
+			return format_duration(task[5]) if task[5] else "-"
+		return None
+
+	def canFetchMore(self, parent=QModelIndex()):
+		return not parent.isValid() and not self._exhausted and not self._fetching
+
+	def fetchMore(self, parent=QModelIndex()):
+		if parent.isValid() or self._fetching:
+			return
+		self._fetching = True
+		if self.search:
+			self.worker.read(
+				self.db.search_tasks, self.search, limit=self.page_size, offset=len(self._rows),
+				callback=self._append_page, channel=("history", id(self))
+			)
+			return
+		after = (self._rows[-1][3], self._rows[-1][0]) if self._rows else None
+		self.worker.read(
+			self.db.get_tasks_page, limit=self.page_size, after=after,
+			callback=self._append_page, channel=("history", id(self))
+		)
+
+	def _append_page(self, rows):
+		self._fetching = False
+		if len(rows) < self.page_size:
+			self._exhausted = True
+		# Rows delivered by a change event while the page was loading are already shown
+		loaded = {task[0] for task in self._rows}
+		rows = [task for task in rows if task[0] not in loaded]
+		if rows:
+			first = len(self._rows)
+			self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+			self._rows.extend(rows)
+			self.endInsertRows()
+		self.pageLoaded.emit()
+
+	def reload(self):
+		"""Drop all loaded rows and fetch the first page again"""
+		self.worker.cancel(("history", id(self)))
+		self.beginResetModel()
+		self._rows = []
+		self._exhausted = False
+		self._fetching = False
+		self.endResetModel()
+		self.fetchMore()
+
+	def set_search(self, text):
+		"""Show tasks matching ``text`` (or the whole history if it is blank)"""
+		text = text.strip()
+		if text != self.search:
+			self.search = text
+			self.reload()
+
+	def apply_change(self, change):
+		"""Apply a Database Change row by row instead of reloading"""
+		# A new task's place among ranked search results is unknown, and a large
+		# batch is cheaper to reload than to apply row by row
+		if (change.reset or (self.search and change.inserted)
+				or len(change.inserted) + len(change.updated) + len(change.deleted) > self.page_size):
+			self.reload()
+			return
+		for task_id in change.deleted:
+			self._remove(task_id)
+		changed_ids = change.updated + change.inserted
+		if changed_ids:
+			self.worker.read(
+				lambda: [self.db.get_task(task_id) for task_id in changed_ids],
+				callback=lambda tasks: self._apply_rows(changed_ids, tasks)
+			)
+
+	def _apply_rows(self, task_ids, tasks):
+		"""Update or insert freshly read rows"""
+		for task_id, task in zip(task_ids, tasks):
+			row = self._row_of(task_id)
+			if task and row is not None and (self.search or self._rows[row][3] == task[3]):
+				self._rows[row] = task
+				self.dataChanged.emit(self.index(row, 0), self.index(row, len(COLUMNS) - 1))
+			elif self.search:
+				self._remove(task_id)
+			else:
+				self._remove(task_id)
+				self._insert(task)
+
+	def _row_of(self, task_id):
+		"""Return the loaded row holding a task id, or None"""
+		for row, task in enumerate(self._rows):
+			if task[0] == task_id:
+				return row
+		return None
+
+	def _remove(self, task_id):
+		row = self._row_of(task_id)
+		if row is not None:
+			self.beginRemoveRows(QModelIndex(), row, row)
+			del self._rows[row]
+			self.endRemoveRows()
+
+	def _insert(self, task):
+		"""Insert a task at its sorted position if it falls inside the loaded rows"""
+		if task is None:
+			return
+		key = (task[3], task[0])
+		lo, hi = 0, len(self._rows)
+		while lo < hi:  # rows are sorted by (start_ts, id) descending
+			mid = (lo + hi) // 2
+			if (self._rows[mid][3], self._rows[mid][0]) > key:
+				lo = mid + 1
+			else:
+				hi = mid
+		if lo == len(self._rows) and not self._exhausted:
+			return  # belongs to a page that has not been fetched yet
+
+		self.beginInsertRows(QModelIndex(), lo, lo)
+		self._rows.insert(lo, task)
+		self.endInsertRows()
+
+	def task(self, row):
+		"""Return the task tuple shown at a row"""
+		return self._rows[row]
+
+	def tasks(self, rows):
+		"""Return the task tuples shown at several rows"""
+		return [self._rows[row] for row in sorted(rows)]
+
+
+class ActionsDelegate(QStyledItemDelegate):
+	"""Paints Edit/Del buttons in the actions column without creating widgets"""
+
+	editClicked = Signal(int)
+	deleteClicked = Signal(int)
+
+	BUTTON_WIDTH = 60
+	BUTTON_HEIGHT = 35
+	SPACING = 8
+
+	def __init__(self, view):
+		super().__init__(view)
+		# Never shown; lets the style sheet's QPushButton#actionButton rules apply
+		self._template = QPushButton(view)
+		self._template.setObjectName("actionButton")
+		self._template.hide()
+
+	def _button_rects(self, rect):
+		"""Return the Edit and Del rectangles centred in a cell"""
+		total = 2 * self.BUTTON_WIDTH + self.SPACING
+		left = rect.x() + (rect.width() - total) // 2
+		top = rect.y() + (rect.height() - self.BUTTON_HEIGHT) // 2
+		edit = QRect(left, top, self.BUTTON_WIDTH, self.BUTTON_HEIGHT)
+		delete = QRect(left + self.BUTTON_WIDTH + self.SPACING, top, self.BUTTON_WIDTH, self.BUTTON_HEIGHT)
+		return edit, delete
+
+	def paint(self, painter, option, index):
+		if index.column() != ACTIONS_COLUMN:
+			super().paint(painter, option, index)
+			return
+
+		style = self._template.style()
+		hovered = option.state & QStyle.StateFlag.State_MouseOver
+		cursor = option.widget.viewport().mapFromGlobal(option.widget.cursor().pos()) if hovered else None
+		for text, rect in zip(("Edit", "Del"), self._button_rects(option.rect)):
+			button = QStyleOptionButton()
+			button.rect = rect
+			button.text = text
+			button.state = QStyle.StateFlag.State_Enabled
+			if cursor is not None and rect.contains(cursor):
+				button.state |= QStyle.StateFlag.State_MouseOver
+			style.drawControl(QStyle.ControlElement.CE_PushButton, button, painter, self._template)
+
+	def editorEvent(self, event, model, option, index):
+		if index.column() != ACTIONS_COLUMN or event.type() != QEvent.Type.MouseButtonRelease:
+			return super().editorEvent(event, model, option, index)
+
+		edit, delete = self._button_rects(option.rect)
+		pos = event.position().toPoint()
+		if edit.contains(pos):
+			self.editClicked.emit(index.row())
+			return True
+		if delete.contains(pos):
+			self.deleteClicked.emit(index.row())
+			return True
+		return False
@@ -4,33 +4,84 @@ Main window UI for TimePunch
 
 from PySide6.QtWidgets import (
 	QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-	QLabel, QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
-	QComboBox, QMessageBox, QHeaderView, QFrame, QSplitter
+	QLabel, QLineEdit, QPushButton, QTableView, QAbstractItemView,
+	QComboBox, QMessageBox, QHeaderView, QFrame, QSplitter, QFileDialog,
+	QMenu, QInputDialog
 )
 from PySide6.QtCore import Qt, QTimer
 from PySide6.QtGui import QFont, QKeySequence, QShortcut
-from datetime import datetime, timedelta
+import time
 
-from database import Database
-from ui.dialogs import EditTaskDialog, SummaryDialog, CustomRangeSummaryDialog
+from database import Database, TaskAlreadyRunning
+from metrics import StartupProfiler
+from reports import generate_summary, period_range, PERIOD_TITLES
+from tagindex import TagIndex
+from ui.history_model import HistoryModel, ActionsDelegate, ACTIONS_COLUMN
 from ui.styles import get_stylesheet
+from ui.tag_completer import TagCompleter
+from ui.workers import DbWorker
 
 
 class TimePunchWindow(QMainWindow):
 	"""Main application window"""
 	
-	def __init__(self):
+	def __init__(self, profiler=None, query_metrics=False):
 		super().__init__()
+		self.profiler = profiler or StartupProfiler()
 		self.db = Database()
+		if query_metrics:
+			self.db.enable_metrics()
+		self.profiler.mark("open database")
+		self.worker = DbWorker(self)
 		self.current_task_id = None
+		self.current_start = None  # start epoch of the running task, cached for the timer
+		self.tag_index = TagIndex()
 		self.timer = QTimer()
 		self.timer.timeout.connect(self.update_timer_display)
 		self.dark_mode = self.db.get_setting('dark_mode', 'true') == 'true'
 		
 		self.setup_ui()
+		self.profiler.mark("build widgets")
 		self.apply_theme()
-		self.check_running_task()
 		self.setup_shortcuts()
+		self.profiler.mark("apply theme")
+		
+		# History, tags and the running task are loaded after the first paint
+		self._painted = False
+		self._pending_loads = 0
+	
+	def paintEvent(self, event):
+		"""Kick off the deferred data load once the window has been painted"""
+		super().paintEvent(event)
+		if not self._painted:
+			self._painted = True
+			self.profiler.mark("first paint")
+			QTimer.singleShot(0, self.load_initial_data)
+	
+	def load_initial_data(self):
+		"""Stream in the database-backed parts of the window after it is shown"""
+		self._pending_loads = 3
+		self.history_model.pageLoaded.connect(self._on_first_page, Qt.ConnectionType.SingleShotConnection)
+		self.history_model.fetchMore()
+		self.worker.read(self.db.get_tag_stats, callback=self._on_initial_tags, channel="tags")
+		self.worker.read(self.db.get_running_task, callback=self._on_initial_running_task)
+	
+	def _on_first_page(self):
+		self._initial_load_done("history loaded")
+	
+	def _on_initial_tags(self, stats):
+		self.set_tag_stats(stats)
+		self._initial_load_done("tags loaded")
+	
+	def _on_initial_running_task(self, task):
+		self.show_running_task(task)
+		self._initial_load_done("running task restored")
+	
+	def _initial_load_done(self, phase):
+		self.profiler.mark(phase)
+		self._pending_loads -= 1
+		if not self._pending_loads:
+			self.profiler.report()
 	
 	def setup_ui(self):
 		"""Setup the user interface"""
@@ -67,7 +118,8 @@ class TimePunchWindow(QMainWindow):
 		self.tag_input.setEditable(True)
 		self.tag_input.lineEdit().setPlaceholderText("e.g., research, email")
 		self.tag_input.setMinimumHeight(40)
-		self.refresh_tags()
+		self.tag_completer = TagCompleter(self.tag_index, self.tag_input)
+		self.tag_completer.attach(self.tag_input.lineEdit())
 		left_layout.addWidget(self.tag_input)
 		
 		# Control buttons
@@ -129,6 +181,19 @@ class TimePunchWindow(QMainWindow):
 		
 		left_layout.addLayout(summary_layout)
 		
+		# Import / export
+		transfer_layout = QHBoxLayout()
+		import_btn = QPushButton("Import...")
+		import_btn.setMinimumHeight(50)
+		import_btn.clicked.connect(self.import_tasks)
+		transfer_layout.addWidget(import_btn)
+		
+		export_btn = QPushButton("Export...")
+		export_btn.setMinimumHeight(50)
+		export_btn.clicked.connect(self.export_tasks)
+		transfer_layout.addWidget(export_btn)
+		left_layout.addLayout(transfer_layout)
+		
 		# Theme toggle
 		self.theme_btn = QPushButton("Toggle Theme")
 		self.theme_btn.setMinimumHeight(50)
@@ -145,9 +210,26 @@ class TimePunchWindow(QMainWindow):
 		history_title.setFont(QFont("Arial", 16, QFont.Weight.Bold))
 		right_layout.addWidget(history_title)
 		
-		self.history_table = QTableWidget()
-		self.history_table.setColumnCount(6)
-		self.history_table.setHorizontalHeaderLabels(["Task", "Tags", "Start", "End", "Duration", "Actions"])
+		# Search box; queries run once typing pauses
+		self.search_input = QLineEdit()
+		self.search_input.setPlaceholderText("Search tasks and tags...")
+		self.search_input.setClearButtonEnabled(True)
+		self.search_input.setMinimumHeight(40)
+		self.search_timer = QTimer(self)
+		self.search_timer.setSingleShot(True)
+		self.search_timer.setInterval(200)
+		self.search_timer.timeout.connect(self.apply_search)
+		self.search_input.textChanged.connect(self.search_timer.start)
+		right_layout.addWidget(self.search_input)
+		
+		self.history_model = HistoryModel(self.db, self.worker, parent=self)
+		self.history_table = QTableView()
+		self.history_table.setModel(self.history_model)
+		self.history_delegate = ActionsDelegate(self.history_table)
+		self.history_delegate.editClicked.connect(self.edit_task)
+		self.history_delegate.deleteClicked.connect(self.delete_task)
+		self.history_table.setItemDelegateForColumn(ACTIONS_COLUMN, self.history_delegate)
+		self.history_table.setMouseTracking(True)
 		
 		# Set column widths
 		header = self.history_table.horizontalHeader()
@@ -156,11 +238,16 @@ class TimePunchWindow(QMainWindow):
 		header.setSectionResizeMode(2, QHeaderView.ResizeMode.ResizeToContents)  # Start
 		header.setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)  # End
 		header.setSectionResizeMode(4, QHeaderView.ResizeMode.ResizeToContents)  # Duration
-		self.history_table.setColumnWidth(5, 150)  # Actions column fixed width
-		
-		self.history_table.setSelectionBehavior(QTableWidget.SelectionBehavior.SelectRows)
+		header.setSectionResizeMode(ACTIONS_COLUMN, QHeaderView.ResizeMode.Fixed)
+		self.history_table.setColumnWidth(ACTIONS_COLUMN, 150)  # Actions column fixed width
+		
+		self.history_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+		self.history_table.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+		self.history_table.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+		self.history_table.customContextMenuRequested.connect(self.show_history_menu)
+		self.history_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
 		self.history_table.verticalHeader().setDefaultSectionSize(60)
-		self.history_table.cellClicked.connect(self.on_task_clicked)
+		self.history_table.clicked.connect(self.on_task_clicked)
 		right_layout.addWidget(self.history_table)
 		
 		# Splitter
@@ -171,8 +258,6 @@ class TimePunchWindow(QMainWindow):
 		splitter.setStretchFactor(1, 2)
 		
 		main_layout.addWidget(splitter)
-		
-		self.refresh_history()
 	
 	def setup_shortcuts(self):
 		"""Setup keyboard shortcuts"""
@@ -181,6 +266,9 @@ class TimePunchWindow(QMainWindow):
 		QShortcut(QKeySequence("Ctrl+W"), self, self.show_weekly_summary)
 		QShortcut(QKeySequence("Ctrl+M"), self, self.show_monthly_summary)
 		QShortcut(QKeySequence("Return"), self, self.toggle_task)
+		QShortcut(QKeySequence("Ctrl+D"), self, self.show_diagnostics)
+		QShortcut(QKeySequence("Ctrl+F"), self, self.search_input.setFocus)
+		QShortcut(QKeySequence.StandardKey.Delete, self.history_table, self.delete_selected_tasks)
 	
 	def apply_theme(self):
 		"""Apply dark or light theme"""
@@ -189,7 +277,10 @@ class TimePunchWindow(QMainWindow):
 	def toggle_theme(self):
 		"""Toggle between dark and light themes"""
 		self.dark_mode = not self.dark_mode
-		self.db.set_setting('dark_mode', 'true' if self.dark_mode else 'false')
+		self.worker.write(
+			self.db.set_setting, 'dark_mode', 'true' if self.dark_mode else 'false',
+			error=lambda e: self.show_error(f"Failed to save the theme: {e}")
+		)
 		self.apply_theme()
 	
 	def focus_task_input(self):
@@ -200,22 +291,24 @@ class TimePunchWindow(QMainWindow):
 		"""Toggle between start and stop"""
 		if self.current_task_id:
 			self.stop_task()
-		else:
+		elif self.start_btn.isEnabled():  # not waiting on a start already
 			self.start_task()
 	
-	def check_running_task(self):
-		"""Check if there's a running task on startup"""
-		task = self.db.get_running_task()
-		if task:
-			self.current_task_id = task[0]
-			self.task_input.setText(task[1])
-			self.tag_input.setCurrentText(task[2] or "")
-			self.start_btn.setEnabled(False)
-			self.stop_btn.setEnabled(True)
-			self.task_input.setEnabled(False)
-			self.tag_input.setEnabled(False)
-			self.current_task_label.setText(f"Active: {task[1]}")
-			self.timer.start(1000)
+	def show_running_task(self, task):
+		"""Switch the controls to tracking a task row"""
+		if not task:
+			return
+		self.current_task_id = task[0]
+		self.current_start = task[3]
+		self.task_input.setText(task[1])
+		self.tag_input.setCurrentText(task[2] or "")
+		self.start_btn.setEnabled(False)
+		self.stop_btn.setEnabled(True)
+		self.task_input.setEnabled(False)
+		self.tag_input.setEnabled(False)
+		self.current_task_label.setText(f"Active: {task[1]}")
+		self.update_timer_display()
+		self.timer.start(1000)
 	
 	def start_task(self):
 		"""Start tracking a new task"""
@@ -225,23 +318,56 @@ class TimePunchWindow(QMainWindow):
 			return
 		
 		tags = self.tag_input.currentText().strip()
-		self.current_task_id = self.db.start_task(task_name, tags)
 		
+		# Lock the inputs right away; the stop button is enabled once the row exists
 		self.start_btn.setEnabled(False)
-		self.stop_btn.setEnabled(True)
 		self.task_input.setEnabled(False)
 		self.tag_input.setEnabled(False)
 		self.current_task_label.setText(f"Active: {task_name}")
 		
-		self.timer.start(1000)
+		self.worker.write(
+			self._start_and_fetch, task_name, tags,
+			callback=self.on_task_started,
+			error=self.on_start_failed
+		)
+	
+	def on_start_failed(self, error):
+		"""Report a failed start, then follow a task another process started"""
+		self.show_error(f"Failed to start task: {error}", self.reset_running_state)
+		if isinstance(error, TaskAlreadyRunning):
+			self.worker.read(self.db.get_running_task, callback=self.show_running_task)
+	
+	def on_task_started(self, task):
+		"""Count the new task's tags and show it as running"""
+		self.tag_index.add(task[2], task[3])
+		self.update_tag_dropdown()
+		self.show_running_task(task)
+	
+	def _start_and_fetch(self, name, tags):
+		"""Start a task and return its row (runs on the write worker)"""
+		return self.db.get_task(self.db.start_task(name, tags))
 	
 	def stop_task(self):
 		"""Stop the current task"""
 		if not self.current_task_id:
 			return
 		
-		self.db.stop_task(self.current_task_id)
+		self.worker.write(
+			self.db.stop_task, self.current_task_id,
+			error=lambda e: self.show_error(f"Failed to stop task: {e}")
+		)
+		self.reset_running_state()
+	
+	def show_error(self, message, then=None):
+		"""Report a failed background operation"""
+		QMessageBox.critical(self, "Error", message)
+		if then is not None:
+			then()
+	
+	def reset_running_state(self):
+		"""Clear the running task and return the controls to idle"""
 		self.current_task_id = None
+		self.current_start = None
 		
 		self.timer.stop()
 		self.timer_label.setText("00:00:00")
@@ -253,92 +379,48 @@ class TimePunchWindow(QMainWindow):
 		self.tag_input.setEnabled(True)
 		self.task_input.clear()
 		self.tag_input.setCurrentText("")
-		
-		self.refresh_history()
-		self.refresh_tags()
 	
 	def update_timer_display(self):
-		"""Update the timer display"""
-		if not self.current_task_id:
+		"""Update the timer display from the cached start time (no database access)"""
+		if not self.current_start:
 			return
 		
-		task = self.db.get_running_task()
-		if task:
-			start = datetime.fromisoformat(task[3])
-			elapsed = datetime.now() - start
-			hours, remainder = divmod(int(elapsed.total_seconds()), 3600)
-			minutes, seconds = divmod(remainder, 60)
-			self.timer_label.setText(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
+		elapsed = time.time() - self.current_start
+		hours, remainder = divmod(int(elapsed), 3600)
+		minutes, seconds = divmod(remainder, 60)
+		self.timer_label.setText(f"{hours:02d}:{minutes:02d}:{seconds:02d}")
 	
 	def refresh_history(self):
-		"""Refresh the history table"""
-		tasks = self.db.get_all_tasks()
-		self.history_table.setRowCount(len(tasks))
-		
-		for row, task in enumerate(tasks):
-			# Task name
-			self.history_table.setItem(row, 0, QTableWidgetItem(task[1]))
-			
-			# Tags
-			self.history_table.setItem(row, 1, QTableWidgetItem(task[2] or ""))
-			
-			# Start time
-			start = datetime.fromisoformat(task[3])
-			self.history_table.setItem(row, 2, QTableWidgetItem(start.strftime("%d/%m %H:%M")))
-			
-			# End time
-			if task[4]:
-				end = datetime.fromisoformat(task[4])
-				self.history_table.setItem(row, 3, QTableWidgetItem(end.strftime("%d/%m %H:%M")))
-			else:
-				self.history_table.setItem(row, 3, QTableWidgetItem("Running..."))
-			
-			# Duration
-			if task[5]:
-				hours, remainder = divmod(task[5], 3600)
-				minutes, seconds = divmod(remainder, 60)
-				duration_str = f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-				self.history_table.setItem(row, 4, QTableWidgetItem(duration_str))
-			else:
-				self.history_table.setItem(row, 4, QTableWidgetItem("-"))
-			
-			# Actions buttons
-			actions_widget = QWidget()
-			actions_layout = QHBoxLayout(actions_widget)
-			actions_layout.setContentsMargins(8, 0, 8, 0)
-			actions_layout.setSpacing(8)
-			actions_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-			
-			edit_btn = QPushButton("Edit")
-			edit_btn.setObjectName("actionButton")
-			edit_btn.setFixedHeight(35)
-			edit_btn.setFixedWidth(60)
-			edit_btn.clicked.connect(lambda checked, r=row: self.edit_task(r))
-			
-			delete_btn = QPushButton("Del")
-			delete_btn.setObjectName("actionButton")
-			delete_btn.setFixedHeight(35)
-			delete_btn.setFixedWidth(60)
-			delete_btn.clicked.connect(lambda checked, r=row: self.delete_task(r))
-			
-			actions_layout.addWidget(edit_btn)
-			actions_layout.addWidget(delete_btn)
-			
-			self.history_table.setCellWidget(row, 5, actions_widget)
+		"""Reload the history table from the first page"""
+		self.history_model.reload()
+	
+	def apply_search(self):
+		"""Filter the history table by the search box text"""
+		self.history_model.set_search(self.search_input.text())
+		self.history_table.scrollToTop()
 	
 	def refresh_tags(self):
-		"""Refresh the tag dropdown"""
+		"""Rebuild the tag index from the database (after bulk changes such as imports)"""
+		self.worker.read(self.db.get_tag_stats, callback=self.set_tag_stats, channel="tags")
+	
+	def set_tag_stats(self, stats):
+		"""Load the tag index from (tag, count, last used) rows"""
+		self.tag_index.load(stats)
+		self.update_tag_dropdown()
+	
+	def update_tag_dropdown(self):
+		"""List the top-ranked tags in the dropdown, keeping the typed text"""
 		current = self.tag_input.currentText()
 		self.tag_input.clear()
-		tags = self.db.get_all_tags()
-		self.tag_input.addItems(tags)
+		self.tag_input.addItems(self.tag_index.complete("", limit=20))
 		self.tag_input.setCurrentText(current)
 	
-	def on_task_clicked(self, row, col):
+	def on_task_clicked(self, index):
 		"""Handle task row click - resume task"""
-		if col < 5:  # Don't trigger on action buttons
-			task_name = self.history_table.item(row, 0).text()
-			tags = self.history_table.item(row, 1).text()
+		if index.column() != ACTIONS_COLUMN:  # Don't trigger on action buttons
+			task = self.history_model.task(index.row())
+			task_name = task[1]
+			tags = task[2] or ""
 			
 			if not self.current_task_id:
 				self.task_input.setText(task_name)
@@ -346,34 +428,47 @@ class TimePunchWindow(QMainWindow):
 	
 	def edit_task(self, row):
 		"""Edit a task"""
-		tasks = self.db.get_all_tasks()
-		if row >= len(tasks):
+		if row >= self.history_model.rowCount():
 			return
 		
-		task = tasks[row]
+		task = self.history_model.task(row)
+		from ui.dialogs import EditTaskDialog
 		dialog = EditTaskDialog(task, self)
 		
 		if dialog.exec():
-			data = dialog.get_data()
 			try:
-				self.db.update_task(
-					task[0],
-					data['name'],
-					data['tags'],
-					data['start_time'],
-					data['end_time']
-				)
-				self.refresh_history()
-			except Exception as e:
-				QMessageBox.critical(self, "Error", f"Failed to update task: {str(e)}")
+				data = dialog.get_data()
+			except ValueError as e:
+				self.show_error(f"Invalid time: {e}")
+				return
+			self.worker.write(
+				self.db.update_task,
+				task[0],
+				data['name'],
+				data['tags'],
+				data['start_time'],
+				data['end_time'],
+				callback=lambda _: self.on_task_updated(task, data),
+				error=lambda e: self.show_error(f"Failed to update task: {str(e)}")
+			)
+	
+	def on_task_updated(self, task, data):
+		"""Move the task's tag counts and refresh the running task, which an end time stops"""
+		self.tag_index.remove(task[2])
+		self.tag_index.add(data['tags'], data['start_time'])
+		self.update_tag_dropdown()
+		if task[0] == self.current_task_id:
+			if data['end_time'] is None:
+				self.current_start = data['start_time'].timestamp()
+			else:
+				self.reset_running_state()
 	
 	def delete_task(self, row):
 		"""Delete a task"""
-		tasks = self.db.get_all_tasks()
-		if row >= len(tasks):
+		if row >= self.history_model.rowCount():
 			return
 		
-		task = tasks[row]
+		task = self.history_model.task(row)
 		reply = QMessageBox.question(
 			self,
 			"Confirm Delete",
@@ -382,84 +477,194 @@ class TimePunchWindow(QMainWindow):
 		)
 		
 		if reply == QMessageBox.StandardButton.Yes:
-			self.db.delete_task(task[0])
-			self.refresh_history()
+			self.worker.write(
+				self.db.delete_task, task[0],
+				callback=lambda _: self.tag_index.remove(task[2]),
+				error=lambda e: self.show_error(f"Failed to delete task: {e}")
+			)
+			if task[0] == self.current_task_id:
+				self.reset_running_state()
 	
-	def generate_summary(self, start_date, end_date, title):
-		"""Generate a summary for a date range"""
-		tasks = self.db.get_tasks_by_date_range(start_date, end_date)
+	def selected_tasks(self):
+		"""Return the task tuples of the selected history rows"""
+		rows = {index.row() for index in self.history_table.selectionModel().selectedRows()}
+		return self.history_model.tasks(rows)
+	
+	def show_history_menu(self, pos):
+		"""Offer bulk actions for the selected rows"""
+		tasks = self.selected_tasks()
+		if not tasks:
+			return
+		menu = QMenu(self)
+		menu.addAction(f"Rename {len(tasks)} tasks...", self.rename_selected_tasks)
+		menu.addAction(f"Set tags on {len(tasks)} tasks...", self.retag_selected_tasks)
+		menu.addSeparator()
+		menu.addAction(f"Delete {len(tasks)} tasks", self.delete_selected_tasks)
+		menu.exec(self.history_table.viewport().mapToGlobal(pos))
+	
+	def delete_selected_tasks(self):
+		"""Delete every selected task in one transaction"""
+		tasks = self.selected_tasks()
+		if not tasks:
+			return
+		reply = QMessageBox.question(
+			self,
+			"Confirm Delete",
+			f"Delete {len(tasks)} tasks?" if len(tasks) > 1 else f"Delete task '{tasks[0][1]}'?",
+			QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+		)
+		if reply != QMessageBox.StandardButton.Yes:
+			return
 		
+		def deleted(_):
+			for task in tasks:
+				self.tag_index.remove(task[2])
+			self.update_tag_dropdown()
+		
+		self.worker.write(
+			self.db.delete_tasks, [task[0] for task in tasks],
+			callback=deleted,
+			error=lambda e: self.show_error(f"Failed to delete tasks: {e}")
+		)
+		if self.current_task_id in {task[0] for task in tasks}:
+			self.reset_running_state()
+	
+	def rename_selected_tasks(self):
+		"""Give every selected task the same name"""
+		tasks = self.selected_tasks()
+		if not tasks:
+			return
+		name, ok = QInputDialog.getText(self, "Rename Tasks", f"New name for {len(tasks)} tasks:", text=tasks[0][1])
+		name = name.strip()
+		if not ok or not name:
+			return
+		self.worker.write(
+			self.db.rename_tasks, [task[0] for task in tasks], name,
+			error=lambda e: self.show_error(f"Failed to rename tasks: {e}")
+		)
+		if self.current_task_id in {task[0] for task in tasks}:
+			self.task_input.setText(name)
+			self.current_task_label.setText(f"Active: {name}")
+	
+	def retag_selected_tasks(self):
+		"""Replace the tags of every selected task"""
+		tasks = self.selected_tasks()
 		if not tasks:
-			return f"No tasks found for {title.lower()}."
-		
-		task_totals = {}
-		tag_totals = {}
-		total_seconds = 0
-		
-		for task in tasks:
-			if task[5]:  # Has duration
-				name = task[1]
-				tags = task[2] or ""
-				duration = task[5]
-				
-				task_totals[name] = task_totals.get(name, 0) + duration
-				total_seconds += duration
-				
-				for tag in tags.split(','):
-					tag = tag.strip()
-					if tag:
-						tag_totals[tag] = tag_totals.get(tag, 0) + duration
-		
-		# Format summary
-		lines = [f"{title}\n{'=' * len(title)}\n"]
-		
-		lines.append("BY TASK:")
-		for task, seconds in sorted(task_totals.items(), key=lambda x: -x[1]):
-			hours = seconds / 3600
-			lines.append(f"  {task}: {hours:.2f}h")
-		
-		if tag_totals:
-			lines.append("\nBY TAG:")
-			for tag, seconds in sorted(tag_totals.items(), key=lambda x: -x[1]):
-				hours = seconds / 3600
-				lines.append(f"  {tag}: {hours:.2f}h")
-		
-		total_hours = total_seconds / 3600
-		lines.append(f"\nTOTAL: {total_hours:.2f} hours")
-		
-		return "\n".join(lines)
+			return
+		tags, ok = QInputDialog.getText(
+			self, "Set Tags", f"Tags for {len(tasks)} tasks (comma-separated):", text=tasks[0][2] or ""
+		)
+		if not ok:
+			return
+		
+		def retagged(_):
+			for task in tasks:
+				self.tag_index.remove(task[2])
+				self.tag_index.add(tags, task[3])
+			self.update_tag_dropdown()
+		
+		self.worker.write(
+			self.db.retag_tasks, [task[0] for task in tasks], tags,
+			callback=retagged,
+			error=lambda e: self.show_error(f"Failed to set tags: {e}")
+		)
+		if self.current_task_id in {task[0] for task in tasks}:
+			self.tag_input.setCurrentText(tags)
+	
+	def generate_summary(self, start_date, end_date, title):
+		"""Generate a summary for a date range (runs on a read worker)"""
+		return generate_summary(self.db, start_date, end_date, title)
+	
+	def show_summary(self, start_date, end_date, title):
+		"""Build a summary in the background and show it when ready
+		
+		Requesting another summary first cancels this one.
+		"""
+		self.worker.read(
+			self.generate_summary, start_date, end_date, title,
+			callback=lambda summary: self.show_summary_dialog(title, summary),
+			error=lambda e: self.show_error(f"Failed to build summary: {e}"),
+			channel="summary"
+		)
+	
+	def show_summary_dialog(self, title, summary):
+		"""Display a finished summary"""
+		from ui.dialogs import SummaryDialog
+		SummaryDialog(title, summary, self).exec()
 	
 	def show_daily_summary(self):
 		"""Show daily summary"""
-		today = datetime.now().date().isoformat()
-		summary = self.generate_summary(today, today, "Daily Summary")
-		dialog = SummaryDialog("Daily Summary", summary, self)
-		dialog.exec()
+		self.show_summary(*period_range('day'), PERIOD_TITLES['day'])
 	
 	def show_weekly_summary(self):
 		"""Show weekly summary"""
-		today = datetime.now().date()
-		week_start = (today - timedelta(days=today.weekday())).isoformat()
-		summary = self.generate_summary(week_start, today.isoformat(), "Weekly Summary")
-		dialog = SummaryDialog("Weekly Summary", summary, self)
-		dialog.exec()
+		self.show_summary(*period_range('week'), PERIOD_TITLES['week'])
 	
 	def show_monthly_summary(self):
 		"""Show monthly summary"""
-		today = datetime.now().date()
-		month_start = today.replace(day=1).isoformat()
-		summary = self.generate_summary(month_start, today.isoformat(), "Monthly Summary")
-		dialog = SummaryDialog("Monthly Summary", summary, self)
-		dialog.exec()
+		self.show_summary(*period_range('month'), PERIOD_TITLES['month'])
 	
 	def show_custom_summary(self):
 		"""Show custom date range summary"""
+		from ui.dialogs import CustomRangeSummaryDialog
 		dialog = CustomRangeSummaryDialog(self)
 		if dialog.exec():
 			start_date, end_date = dialog.get_date_range()
 			month_name = dialog.month_combo.currentText()
 			year = dialog.year_combo.currentText()
 			title = f"Summary for {month_name} {year}"
-			summary = self.generate_summary(start_date, end_date, title)
-			result_dialog = SummaryDialog(title, summary, self)
-			result_dialog.exec()
\ No newline at end of file
+			self.show_summary(start_date, end_date, title)
+	
+	def show_diagnostics(self):
+		"""Show query metrics and the slow-query log"""
+		from ui.dialogs import DiagnosticsDialog
+		DiagnosticsDialog(self.db, self).exec()
+	
+	def import_tasks(self):
+		"""Import tasks from a CSV or JSON-lines file in the background"""
+		path, _ = QFileDialog.getOpenFileName(
+			self, "Import Tasks", "", "Time logs (*.csv *.jsonl *.ndjson);;All files (*)"
+		)
+		if not path:
+			return
+		reply = QMessageBox.question(
+			self,
+			"Skip Duplicates",
+			"Skip tasks whose name and start time already exist?",
+			QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
+		)
+		self.worker.write(
+			self.db.import_file, path,
+			skip_duplicates=reply == QMessageBox.StandardButton.Yes,
+			callback=self.on_import_finished,
+			error=lambda e: self.show_error(f"Import failed: {e}")
+		)
+	
+	def on_import_finished(self, result):
+		"""Report an import and refresh the tags it may have added"""
+		self.refresh_tags()
+		QMessageBox.information(
+			self, "Import Complete",
+			f"Imported {result['imported']} tasks ({result['skipped']} duplicates skipped)."
+		)
+	
+	def export_tasks(self):
+		"""Export all tasks to a CSV or JSON-lines file in the background"""
+		path, _ = QFileDialog.getSaveFileName(
+			self, "Export Tasks", "timepunch.csv", "CSV (*.csv);;JSON lines (*.jsonl)"
+		)
+		if not path:
+			return
+		self.worker.read(
+			self.db.export_file, path,
+			callback=lambda count: QMessageBox.information(
+				self, "Export Complete", f"Exported {count} tasks to {path}."
+			),
+			error=lambda e: self.show_error(f"Export failed: {e}")
+		)
+	
+	def closeEvent(self, event):
+		"""Finish queued writes and close the database before exiting"""
+		self.worker.shutdown()
+		self.db.close()
+		super().closeEvent(event)
\ No newline at end of file
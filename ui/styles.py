@@ -63,18 +63,18 @@ def get_stylesheet(dark_mode=True):
 				padding: 20px;
 				margin: 10px 0;
 			}
-			QTableWidget {
+			QTableView {
 				background-color: #2d2d2d;
 				alternate-background-color: #252525;
 				gridline-color: #3d3d3d;
 				border: none;
 				border-radius: 8px;
 			}
-			QTableWidget::item {
+			QTableView::item {
 				padding: 8px;
 				color: #e0e0e0;
 			}
-			QTableWidget::item:selected {
+			QTableView::item:selected {
 				background-color: #00d9ff;
 				color: #1e1e1e;
 			}
@@ -160,18 +160,18 @@ def get_stylesheet(dark_mode=True):
 				padding: 20px;
 				margin: 10px 0;
 			}
-			QTableWidget {
+			QTableView {
 				background-color: #ffffff;
 				alternate-background-color: #ecf0f1;
 				gridline-color: #bdc3c7;
 				border: none;
 				border-radius: 8px;
 			}
-			QTableWidget::item {
+			QTableView::item {
 				padding: 8px;
 				color: #2c3e50;
 			}
-			QTableWidget::item:selected {
+			QTableView::item:selected {
 				background-color: #3498db;
 				color: #ffffff;
 			}
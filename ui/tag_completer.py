@@ -0,0 +1,49 @@
+"""
+Comma-aware tag completer for TimePunch
+"""
+
+from PySide6.QtCore import Qt, QStringListModel
+from PySide6.QtWidgets import QCompleter
+
+from tagindex import split_token
+
+
+class TagCompleter(QCompleter):
+	"""Completes the tag under the cursor in a comma-separated tag field
+
+	Candidates come from a TagIndex, already filtered and ranked, so the
+	completer shows its model unfiltered and only swaps in the last token
+	when a completion is chosen.
+	"""
+
+	def __init__(self, index, parent=None, limit=10):
+		super().__init__(parent)
+		self.index = index
+		self.limit = limit
+		self._line_edit = None
+		self._candidates = QStringListModel(self)
+		self.setModel(self._candidates)
+		self.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+		self.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+
+	def attach(self, line_edit):
+		"""Complete as the user types in a line edit"""
+		# An editable QComboBox makes itself the completer's widget, so keep the line edit
+		self._line_edit = line_edit
+		line_edit.setCompleter(self)
+		line_edit.textEdited.connect(self.update_candidates)
+
+	def update_candidates(self, text):
+		"""Look up completions for the last tag of the field and show them"""
+		self._candidates.setStringList(self.index.complete_field(text, self.limit))
+		if self._candidates.rowCount() and self._line_edit.hasFocus():
+			self.complete()
+		else:
+			self.popup().hide()
+
+	def splitPath(self, path):
+		return [split_token(path)[1]]
+
+	def pathFromIndex(self, index):
+		head, _ = split_token(self._line_edit.text())
+		return head + index.data()
@@ -0,0 +1,118 @@
+"""
+Background database workers for TimePunch
+"""
+
+from itertools import count
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+
+
+class DbJob(QRunnable):
+	"""A single database call queued on a thread pool"""
+
+	def __init__(self, worker, token, fn, args, kwargs, callback, error):
+		super().__init__()
+		self.setAutoDelete(False)
+		self.worker = worker
+		self.token = token
+		self.fn = fn
+		self.args = args
+		self.kwargs = kwargs
+		self.callback = callback
+		self.error = error
+		self.cancelled = False
+		self.result = None
+		self.exception = None
+
+	def run(self):
+		if self.cancelled:
+			return
+		try:
+			self.result = self.fn(*self.args, **self.kwargs)
+		except Exception as e:
+			self.exception = e
+		# Only the job's token crosses threads; the result stays on the job
+		self.worker._done.emit(self.token)
+
+
+class DbWorker(QObject):
+	"""Runs database calls off the GUI thread and delivers results on it
+
+	Reads go to a small pool; writes go to a single-thread pool so they are
+	applied in the order they were submitted. A job submitted on a named
+	``channel`` cancels the previous job on that channel, so stale results
+	(an older summary, a superseded tag refresh) are dropped rather than
+	delivered.
+	"""
+
+	# Emitted from pool threads; queued onto the GUI thread by Qt
+	_done = Signal(int)
+
+	def __init__(self, parent=None, read_threads=2):
+		super().__init__(parent)
+		self.read_pool = QThreadPool(self)
+		self.read_pool.setMaxThreadCount(read_threads)
+		self.write_pool = QThreadPool(self)
+		self.write_pool.setMaxThreadCount(1)
+		# Keep threads (and their SQLite connections) alive between jobs
+		for pool in (self.read_pool, self.write_pool):
+			pool.setExpiryTimeout(-1)
+
+		self._jobs = {}
+		self._tokens = count()
+		self._channels = {}
+		self._done.connect(self._deliver)
+
+	def read(self, fn, *args, callback=None, error=None, channel=None, **kwargs):
+		"""Run a read-only call on the read pool"""
+		return self._submit(self.read_pool, fn, args, kwargs, callback, error, channel)
+
+	def write(self, fn, *args, callback=None, error=None, channel=None, **kwargs):
+		"""Run a mutating call on the ordered write pool"""
+		return self._submit(self.write_pool, fn, args, kwargs, callback, error, channel)
+
+	def cancel(self, channel):
+		"""Cancel the pending job on a channel, dropping its result"""
+		job = self._channels.pop(channel, None)
+		if job is not None:
+			job.cancelled = True
+			if job.pool.tryTake(job):
+				self._jobs.pop(job.token, None)
+
+	def shutdown(self):
+		"""Drop pending reads and wait for queued writes to finish"""
+		for channel, job in list(self._channels.items()):
+			if job.pool is self.read_pool:
+				self.cancel(channel)
+		self.read_pool.clear()
+		self.read_pool.waitForDone()
+		self.write_pool.waitForDone()
+
+	def _submit(self, pool, fn, args, kwargs, callback, error, channel):
+		if channel is not None:
+			self.cancel(channel)
+		job = DbJob(self, next(self._tokens) % 2**31, fn, args, kwargs, callback, error)
+		job.pool = pool
+		if channel is not None:
+			self._channels[channel] = job
+		self._jobs[job.token] = job
+		pool.start(job)
+		return job
+
+	@Slot(int)
+	def _deliver(self, token):
+		job = self._jobs.pop(token, None)
+		if job is None:
+			return
+		for channel, pending in list(self._channels.items()):
+			if pending is job:
+				del self._channels[channel]
+		if job.cancelled:
+			return
+
+		if job.exception is not None:
+			if job.error is None:
+				raise job.exception
+			job.error(job.exception)
+		elif job.callback is not None:
+			job.callback(job.result)
@@ -0,0 +1,166 @@
+"""
+Group-commit write queue for TimePunch
+
+Bursts of punches (an editor reporting every file switch, say) each paid
+for a transaction of their own. WriteQueue applies queued mutations on one
+writer thread instead, committing everything that arrived while the
+previous group was being written (plus an optional extra window) as one
+transaction, so the commit and fsync are shared by the whole group.
+"""
+
+import atexit
+import queue
+import random
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import Future
+from datetime import datetime
+
+from database import BUSY_BACKOFF, BUSY_RETRIES, to_epoch
+
+
+class WriteQueue:
+	"""Write-behind queue that commits mutations in groups
+
+	Each call returns a Future that is resolved only once the transaction
+	holding the mutation has committed, so a result means the write is
+	stored; with ``durable`` (the default) the queue's connection uses
+	synchronous=FULL, so it has also reached the disk. Mutations run in the
+	order they were queued, each in a savepoint, so one that fails (a start
+	refused with TaskAlreadyRunning, say) fails only its own Future.
+
+	Start and stop times are taken when an event is queued, not when it is
+	written. ``flush()`` waits for everything queued so far; ``close()``
+	flushes and stops the writer thread, and runs at interpreter exit.
+	"""
+
+	def __init__(self, db, window=0.0, max_batch=500, durable=True):
+		self.db = db
+		# Seconds to wait for more writes after the first of a group. Writes
+		# already pile up while the previous group commits, and waiting
+		# longer only delays callers that wait for each acknowledgement.
+		self.window = window
+		self.max_batch = max_batch
+		self.durable = durable
+		self.stats = {'writes': 0, 'commits': 0}
+		self._queue = queue.SimpleQueue()
+		self._closed = False
+		self._lock = threading.Lock()
+		self._thread = threading.Thread(target=self._run, name="timepunch-write-queue", daemon=True)
+		self._thread.start()
+		atexit.register(self.close)
+
+	def submit(self, op):
+		"""Queue ``op(cursor)``, which returns (result, changes); return a Future of the result
+
+		``changes`` holds the task ids for the Change sent to subscribers,
+		as ``inserted``, ``updated`` and ``deleted`` lists.
+		"""
+		future = Future()
+		with self._lock:
+			if self._closed:
+				raise RuntimeError("The write queue is closed")
+			self._queue.put((future, op))
+		return future
+
+	def start_task(self, name, tags="", switch=False):
+		"""Queue the start of a task, stamped now; the Future gives its id"""
+		moment = datetime.now()
+
+		def op(cursor):
+			task_id, stopped = self.db._start(cursor, name, tags, switch, moment)
+			return task_id, {'inserted': [task_id], 'updated': [stopped] if stopped else []}
+		return self.submit(op)
+
+	def stop_task(self, task_id):
+		"""Queue stopping a task, stamped now; the Future gives False if it was not running"""
+		end_ts = to_epoch(datetime.now())[0]
+
+		def op(cursor):
+			stopped = self.db._stop(cursor, task_id, end_ts)
+			return stopped, {'updated': [task_id] if stopped else []}
+		return self.submit(op)
+
+	def flush(self, timeout=None):
+		"""Wait until every write queued so far has been committed"""
+		self.submit(lambda cursor: (None, {})).result(timeout)
+
+	def close(self):
+		"""Commit what is queued and stop the writer thread"""
+		with self._lock:
+			if self._closed:
+				return
+			self._closed = True
+			self._queue.put(None)
+		atexit.unregister(self.close)
+		self._thread.join()
+
+	def _run(self):
+		"""Writer thread: gather a group of writes, then commit them together"""
+		if self.durable:
+			self.db.connection().execute("PRAGMA synchronous = FULL")
+		done = False
+		while not done:
+			item = self._queue.get()
+			if item is None:
+				break
+			batch = [item]
+			deadline = time.monotonic() + self.window
+			while len(batch) < self.max_batch:
+				try:
+					item = self._queue.get(timeout=max(0, deadline - time.monotonic()))
+				except queue.Empty:
+					break
+				if item is None:
+					done = True
+					break
+				batch.append(item)
+			batch = [(future, op) for future, op in batch if future.set_running_or_notify_cancel()]
+			if batch:
+				self._commit(batch)
+
+	def _commit(self, batch):
+		"""Apply a group of writes in one transaction, then resolve their Futures"""
+		for attempt in range(BUSY_RETRIES):
+			outcomes = []
+			changes = {'inserted': [], 'updated': [], 'deleted': []}
+			try:
+				with self.db._transaction(immediate=True) as cursor:
+					for future, op in batch:
+						cursor.execute("SAVEPOINT queued_write")
+						try:
+							result, change = op(cursor)
+						except Exception as e:
+							cursor.execute("ROLLBACK TO queued_write")
+							outcomes.append((future, None, e))
+						else:
+							outcomes.append((future, result, None))
+							for key, ids in change.items():
+								changes[key].extend(ids)
+						cursor.execute("RELEASE queued_write")
+				break
+			except Exception as e:
+				if isinstance(e, sqlite3.OperationalError) and "locked" in str(e) and attempt < BUSY_RETRIES - 1:
+					time.sleep(BUSY_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
+					continue
+				# Nothing was committed, so every write in the group failed
+				outcomes = [(future, None, e) for future, _ in batch]
+				changes = None
+				break
+
+		self.stats['writes'] += len(batch)
+		self.stats['commits'] += 1
+		for future, result, error in outcomes:
+			if error is None:
+				future.set_result(result)
+			else:
+				future.set_exception(error)
+		if changes is not None and any(changes.values()):
+			try:
+				self.db._notify(**changes)
+			except Exception:
+				# A failing subscriber must not stop the writer thread
+				traceback.print_exc(file=sys.stderr)